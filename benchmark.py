@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import json
+import multiprocessing
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, TextIO
+from xml.sax.saxutils import escape
+
+from parser import compile_many
+from profiling import StageProfiler
+from renderers import render_files
+
+
+HERE = Path(__file__).resolve().parent
+REAL_CASES = {
+    "capec": {
+        "schema": "schemas/ap_schema_latest.xsd.xml",
+        "roots": ["attack_pattern", "attack_pattern_catalog"],
+        "ignored_keys": "capec_ignored_keys.txt",
+    },
+    "cwe": {
+        "schema": "schemas/cwe_schema_latest.xsd.xml",
+        "roots": ["weakness", "weakness_catalog"],
+        "ignored_keys": "cwe_ignored_keys.txt",
+    },
+}
+SYNTHETIC_SUITES = {
+    "quick": {
+        "small": dict(types=50, depth=4, fanout=3, reuse=0.3),
+        "deep": dict(types=500, depth=500, fanout=1),
+    },
+    "default": {
+        "small": dict(types=50, depth=4, fanout=3, reuse=0.3),
+        "wide": dict(types=2000, depth=3, fanout=12, reuse=0.2),
+        "reuse": dict(types=500, depth=6, fanout=4, reuse=0.9),
+        "recursive": dict(types=300, depth=5, fanout=3, reuse=0.3, recursion=0.5),
+        "deep": dict(types=3000, depth=3000, fanout=1),
+        "docs": dict(types=300, depth=4, fanout=4, reuse=0.5, doc_chars=2000),
+    },
+}
+_LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. "
+)
+
+
+def write_synthetic_xsd(
+    handle: TextIO,
+    types: int = 100,
+    depth: int = 5,
+    fanout: int = 3,
+    reuse: float = 0.0,
+    recursion: float = 0.0,
+    doc_chars: int = 0,
+    seed: int = 0,
+) -> str:
+    """Écrit un XSD synthétique et renvoie le nom de son élément racine.
+
+    Les types complexes sont répartis sur depth niveaux ; chacun déclare
+    fanout éléments du niveau suivant, deux champs scalaires et un attribut.
+    reuse est la probabilité qu'un enfant réutilise un type déjà référencé
+    plutôt que le prochain type libre du niveau ; recursion celle qu'un type
+    référence aussi son premier parent (cycle entre deux types). doc_chars
+    règle le volume de xs:documentation par déclaration.
+    """
+    rng = random.Random(seed)
+    types = max(1, types)
+    depth = max(1, min(depth, types))
+    levels: list[list[int]] = [[] for _ in range(depth)]
+    for index in range(types):
+        levels[index * depth // types].append(index)
+    next_free = [0] * depth
+    owner: dict[int, int] = {}
+    enums = max(1, types // 10)
+    documentation = (_LOREM * (doc_chars // len(_LOREM) + 1))[:doc_chars]
+
+    def annotation(indent: str) -> str:
+        if not doc_chars:
+            return ""
+        return (
+            f"{indent}<xs:annotation><xs:documentation>{escape(documentation)}"
+            "</xs:documentation></xs:annotation>\n"
+        )
+
+    write = handle.write
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write('<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" elementFormDefault="qualified">\n')
+    write('  <xs:element name="Root" type="Type0"/>\n')
+    for number in range(enums):
+        write(f'  <xs:simpleType name="Enum{number}">\n    <xs:restriction base="xs:token">\n')
+        for value in range(4):
+            write(f'      <xs:enumeration value="Value{number}_{value}"/>\n')
+        write("    </xs:restriction>\n  </xs:simpleType>\n")
+
+    for level, members in enumerate(levels):
+        for index in members:
+            write(f'  <xs:complexType name="Type{index}">\n')
+            write(annotation("    "))
+            write("    <xs:sequence>\n")
+            children: list[int] = []
+            if level + 1 < depth:
+                below = levels[level + 1]
+                for _ in range(fanout):
+                    if children and rng.random() < reuse:
+                        children.append(rng.choice(below))
+                    else:
+                        children.append(below[next_free[level + 1] % len(below)])
+                        next_free[level + 1] += 1
+                    owner.setdefault(children[-1], index)
+            if rng.random() < recursion:
+                # Cycle : retour vers le premier parent du type (ou vers lui-même).
+                children.append(owner.get(index, index))
+            for slot, child in enumerate(children):
+                occurs = ' minOccurs="0"' if slot % 3 == 1 else ""
+                occurs += ' maxOccurs="unbounded"' if slot % 2 == 1 else ""
+                write(f'      <xs:element name="Child{slot}_{child}" type="Type{child}"{occurs}>\n')
+                write(annotation("        "))
+                write("      </xs:element>\n")
+            write(f'      <xs:element name="Label{index}" type="xs:string"/>\n')
+            write(f'      <xs:element name="Kind{index}" type="Enum{index % enums}" minOccurs="0"/>\n')
+            write("    </xs:sequence>\n")
+            write(f'    <xs:attribute name="ID{index}" type="xs:integer" use="required"/>\n')
+            write("  </xs:complexType>\n")
+    write("</xs:schema>\n")
+    return "Root"
+
+
+def _summarize(runs: list[list[dict[str, Any]]]) -> dict[str, dict[str, Any]]:
+    # Regroupe les étapes par nom (et racine) sur l'ensemble des répétitions.
+    grouped: dict[str, list[dict[str, Any]]] = {}
+    for stages in runs:
+        for record in stages:
+            key = record["stage"] + (f":{record['root']}" if "root" in record else "")
+            grouped.setdefault(key, []).append(record)
+    summary = {}
+    for key, records in grouped.items():
+        walls = [record["wall_s"] for record in records]
+        cpus = [record["cpu_s"] for record in records]
+        entry: dict[str, Any] = {
+            "wall_s": {"first": walls[0], "min": min(walls), "median": statistics.median(walls)},
+            "cpu_s": {"first": cpus[0], "min": min(cpus), "median": statistics.median(cpus)},
+        }
+        peaks = [record["peak_alloc_bytes"] for record in records if "peak_alloc_bytes" in record]
+        if peaks:
+            entry["peak_alloc_bytes"] = max(peaks)
+        entry.update(
+            (name, value)
+            for name, value in records[-1].items()
+            if name not in {"stage", "root", "wall_s", "cpu_s", "peak_alloc_bytes"}
+        )
+        summary[key] = entry
+    return summary
+
+
+def run_case(case: dict[str, Any], repeat: int = 3, trace_memory: bool = True) -> dict[str, Any]:
+    """Charge, compile puis rend (.schema.txt et .puml) un cas, repeat fois.
+
+    La lecture et l'indexation du schéma forment une seule passe en flux :
+    elles sont mesurées ensemble dans l'étape load.
+    """
+    runs = []
+    for _ in range(max(1, repeat)):
+        profiler = StageProfiler()
+        if trace_memory:
+            profiler.start()
+        with tempfile.TemporaryDirectory() as output_dir:
+            with profiler.stage("total"):
+                compiled = compile_many(
+                    case["schema"],
+                    case["roots"],
+                    ignored_keys_path=case.get("ignored_keys"),
+                    profiler=profiler,
+                )
+                for root, (root_name, expr) in zip(case["roots"], compiled):
+                    outputs = {
+                        "txt": Path(output_dir) / f"{root_name}.schema.txt",
+                        "puml": Path(output_dir) / f"{root_name}.puml",
+                    }
+                    with profiler.stage("render", root=root) as record:
+                        render_files(root_name, expr, outputs)
+                        record["output_bytes"] = sum(path.stat().st_size for path in outputs.values())
+        profiler.stop()
+        runs.append(profiler.stages)
+    return {
+        "name": case["name"],
+        "params": case.get("params", {}),
+        "schema_bytes": Path(case["schema"]).stat().st_size,
+        "repeat": len(runs),
+        "stages": _summarize(runs),
+    }
+
+
+def _run_isolated(case: dict[str, Any], repeat: int, trace_memory: bool) -> dict[str, Any]:
+    # Un interpréteur neuf par cas : la table d'internement des Expr et le
+    # cache de _snake_case ne profitent pas d'un cas à l'autre.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_case, case, repeat, trace_memory).result()
+
+
+def _git_revision() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """Lignes « cas étape : avant -> après (ratio) » sur la durée médiane."""
+    previous = {case["name"]: case["stages"] for case in baseline.get("cases", [])}
+    lines = []
+    for case in report["cases"]:
+        for key, entry in case["stages"].items():
+            before = previous.get(case["name"], {}).get(key)
+            if before is None:
+                continue
+            old, new = before["wall_s"]["median"], entry["wall_s"]["median"]
+            ratio = f"x{new / old:.2f}" if old else "-"
+            lines.append(f"{case['name']:<12} {key:<40} {old * 1000:10.2f} ms -> {new * 1000:10.2f} ms  {ratio}")
+    return lines
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(
+        description="Mesure chargement, compilation et rendu sur des XSD synthétiques et réels."
+    )
+    cli.add_argument("--suite", choices=sorted(SYNTHETIC_SUITES), default="default", help="Jeu de cas synthétiques")
+    cli.add_argument("--no-real", action="store_true", help="N'inclut pas les schémas CAPEC/CWE du dépôt")
+    cli.add_argument("--no-synthetic", action="store_true", help="N'inclut que les schémas réels")
+    cli.add_argument("--types", type=int, help="Cas personnalisé : nombre de complexTypes")
+    cli.add_argument("--depth", type=int, default=5, help="Cas personnalisé : profondeur d'imbrication")
+    cli.add_argument("--fanout", type=int, default=3, help="Cas personnalisé : enfants complexes par type")
+    cli.add_argument("--reuse", type=float, default=0.0, help="Cas personnalisé : probabilité de réutiliser un type")
+    cli.add_argument("--recursion", type=float, default=0.0, help="Cas personnalisé : probabilité de cycle par type")
+    cli.add_argument("--doc-chars", type=int, default=0, help="Cas personnalisé : caractères de documentation")
+    cli.add_argument("--seed", type=int, default=0, help="Graine des schémas synthétiques")
+    cli.add_argument("--repeat", type=int, default=3, help="Répétitions par cas (dans un même processus)")
+    cli.add_argument("--no-memory", action="store_true", help="Désactive tracemalloc (durées plus fidèles)")
+    cli.add_argument("--keep-schemas", default=None, help="Conserve les XSD synthétiques dans ce répertoire")
+    cli.add_argument("--output", default=None, help="Fichier JSON des résultats (défaut : generated/benchmarks/)")
+    cli.add_argument("--baseline", default=None, help="Rapport JSON précédent à comparer")
+
+    args = cli.parse_args()
+    synthetic: dict[str, dict[str, Any]] = {}
+    if not args.no_synthetic:
+        synthetic.update(SYNTHETIC_SUITES[args.suite])
+    if args.types is not None:
+        synthetic["custom"] = dict(
+            types=args.types,
+            depth=args.depth,
+            fanout=args.fanout,
+            reuse=args.reuse,
+            recursion=args.recursion,
+            doc_chars=args.doc_chars,
+        )
+
+    with tempfile.TemporaryDirectory() as scratch:
+        schema_dir = Path(args.keep_schemas or scratch)
+        schema_dir.mkdir(parents=True, exist_ok=True)
+        cases = []
+        for name, params in synthetic.items():
+            params = dict(params, seed=args.seed)
+            path = schema_dir / f"synthetic-{name}.xsd"
+            with path.open("w", encoding="utf-8") as handle:
+                root = write_synthetic_xsd(handle, **params)
+            cases.append({"name": name, "params": params, "schema": str(path), "roots": [root]})
+        if not args.no_real:
+            for name, case in REAL_CASES.items():
+                cases.append(
+                    {
+                        "name": name,
+                        "schema": str(HERE / case["schema"]),
+                        "roots": case["roots"],
+                        "ignored_keys": str(HERE / case["ignored_keys"]),
+                    }
+                )
+
+        results = []
+        for case in cases:
+            print(f"{case['name']}...", file=sys.stderr)
+            results.append(_run_isolated(case, args.repeat, not args.no_memory))
+
+    now = datetime.now(timezone.utc)
+    report = {
+        "created": now.isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tracemalloc": not args.no_memory,
+        "cases": results,
+    }
+    output = Path(args.output) if args.output else HERE / "generated" / "benchmarks" / f"{now:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(output)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        for line in compare(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,30 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+import ctypes
+import ctypes.util
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+import hashlib
+import json
 import os
 from pathlib import Path
+import queue
+import select
 import shutil
 import subprocess
 import sys
+import threading
+import time
+from typing import Iterable
+import uuid
 
-from parser import parse
+from parser import CompileCache, CompilerPool, compile_many, root_output_name
+from profiling import StageProfiler, write_report
+from renderers import SINKS, SplitPumlSink, render_files
 
 
 def schema_txt_to_puml(schema_txt_path: Path, puml_path: Path, title: str | None = None) -> None:
@@ -29,7 +46,7 @@ def schema_txt_to_puml(schema_txt_path: Path, puml_path: Path, title: str | None
     puml_path.write_text("\n".join(puml_lines) + "\n", encoding="utf-8")
 
 
-def _plantuml_base_command() -> list[str]:
+def _discover_base_command() -> list[str]:
     brew_opt_roots = [Path("/usr/local/opt"), Path("/opt/homebrew/opt")]
     java_bin = shutil.which("java")
     for root in brew_opt_roots:
@@ -56,13 +73,215 @@ def _plantuml_base_command() -> list[str]:
     )
 
 
-def render_pdf(puml_path: Path, out_dir: Path) -> Path:
-    out_dir.mkdir(parents=True, exist_ok=True)
-    pdf_path = out_dir / f"{puml_path.stem}.pdf"
+@lru_cache(maxsize=None)
+def _cached_base_command(path_env: str, plantuml_jar_env: str) -> tuple[str, ...]:
+    return tuple(_discover_base_command())
+
+
+def _plantuml_base_command() -> list[str]:
+    # Résolue une fois par processus tant que PATH et PLANTUML_JAR ne changent pas.
+    return list(_cached_base_command(os.environ.get("PATH", ""), os.environ.get("PLANTUML_JAR", "")))
+
+
+@dataclass(frozen=True)
+class PlantUMLToolchain:
+    command: tuple[str, ...]
+    version: str | None
+    pdf_support: bool | None
+
+
+_toolchains: dict[tuple[str, ...], PlantUMLToolchain] = {}
+
+
+def _toolchain_disk_key(command: list[str]) -> str:
+    # Empreinte (taille, date) des exécutables et jars de la commande : une
+    # mise à jour de PlantUML ou de Java invalide le sondage enregistré.
+    stats = []
+    for part in command:
+        for candidate in part.split(":"):
+            path = Path(candidate.rstrip("*").rstrip("/"))
+            if path.is_file():
+                stat = path.stat()
+                stats.append((str(path), stat.st_size, stat.st_mtime_ns))
+    env = [os.environ.get(name, "") for name in ("PATH", "PLANTUML_JAR", "JAVA_HOME")]
+    return _fingerprint(command, stats, env)
+
+
+def _probe_version(command: list[str]) -> str | None:
+    try:
+        completed = subprocess.run(command + ["-version"], capture_output=True, text=True, timeout=120)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    for line in completed.stdout.splitlines():
+        if "PlantUML version" in line:
+            return line.strip()
+    return None
+
+
+def _store_toolchain(cache_path: Path, toolchain: PlantUMLToolchain) -> None:
+    stored = _load_manifest(cache_path)
+    stored[_toolchain_disk_key(list(toolchain.command))] = {
+        "command": list(toolchain.command),
+        "version": toolchain.version,
+        "pdf_support": toolchain.pdf_support,
+    }
+    _save_manifest(cache_path, stored)
+
+
+def plantuml_toolchain(cache_path: Path | None = None, force: bool = False) -> PlantUMLToolchain:
+    """Commande PlantUML résolue, avec sa version et son support PDF.
+
+    La version (un lancement de PlantUML) est mémorisée par processus et,
+    si cache_path est fourni, sur disque sous une clé dérivée de PATH,
+    PLANTUML_JAR, JAVA_HOME et des fichiers désignés par la commande ;
+    force ignore l'entrée disque (pas le mémo du processus). Le support PDF n'est pas sondé : il est
+    déduit du premier rendu réussi (confirm_pdf_support). Seuls des résultats
+    connus sont enregistrés, jamais un échec ou une version introuvable.
+    """
+    env_key = tuple(os.environ.get(name, "") for name in ("PATH", "PLANTUML_JAR", "JAVA_HOME"))
+    toolchain = _toolchains.get(env_key)
+    if toolchain is not None:
+        return toolchain
+
+    command = _plantuml_base_command()
+    entry = None
+    if cache_path and not force:
+        entry = _load_manifest(cache_path).get(_toolchain_disk_key(command))
+    if isinstance(entry, dict) and entry.get("command") == command and entry.get("version"):
+        toolchain = PlantUMLToolchain(tuple(command), entry["version"], entry.get("pdf_support") or None)
+    else:
+        toolchain = PlantUMLToolchain(tuple(command), _probe_version(command), None)
+        if cache_path and toolchain.version:
+            _store_toolchain(cache_path, toolchain)
+    _toolchains[env_key] = toolchain
+    return toolchain
+
+
+def confirm_pdf_support(toolchain: PlantUMLToolchain, cache_path: Path | None = None) -> PlantUMLToolchain:
+    """Note qu'un rendu PDF a réussi avec cette chaîne d'outils."""
+    if toolchain.pdf_support:
+        return toolchain
+    confirmed = PlantUMLToolchain(toolchain.command, toolchain.version, True)
+    env_key = tuple(os.environ.get(name, "") for name in ("PATH", "PLANTUML_JAR", "JAVA_HOME"))
+    _toolchains[env_key] = confirmed
+    if cache_path and confirmed.version:
+        _store_toolchain(cache_path, confirmed)
+    return confirmed
+
+
+class PlantUMLWorkerError(RuntimeError):
+    pass
+
+
+class PlantUMLWorker:
+    """JVM PlantUML persistante pilotée en mode -pipe.
+
+    Chaque diagramme est écrit sur stdin ; PlantUML renvoie le PDF sur stdout,
+    suivi d'un délimiteur unique (-pipedelimitor) qui sépare les rendus.
+    """
+
+    def __init__(self, base_command: list[str], timeout: float = 300.0):
+        self.delimiter = f"AKBM-{uuid.uuid4().hex}".encode("ascii")
+        self.timeout = timeout
+        self._buffer = bytearray()
+        self._chunks: queue.Queue[bytes] = queue.Queue()
+        self._process = subprocess.Popen(
+            base_command + ["-tpdf", "-pipe", "-pipedelimitor", self.delimiter.decode("ascii")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self) -> None:
+        # Lecture en tâche de fond : render() peut ainsi attendre avec un délai.
+        stdout = self._process.stdout
+        assert stdout is not None
+        while True:
+            chunk = stdout.read1(1 << 16)
+            self._chunks.put(chunk)
+            if not chunk:
+                return
+
+    def render(self, source: bytes) -> bytes:
+        if self._process.poll() is not None:
+            raise PlantUMLWorkerError("le processus PlantUML -pipe s'est arrêté")
+        stdin = self._process.stdin
+        assert stdin is not None
+        try:
+            stdin.write(source if source.endswith(b"\n") else source + b"\n")
+            stdin.flush()
+        except OSError as exc:
+            raise PlantUMLWorkerError(f"écriture vers PlantUML impossible ({exc})") from exc
+
+        deadline = time.monotonic() + self.timeout
+        searched = 0
+        while True:
+            index = self._buffer.find(self.delimiter, searched)
+            if index >= 0:
+                image = bytes(self._buffer[:index]).lstrip(b"\r\n")
+                del self._buffer[: index + len(self.delimiter)]
+                return image
+            searched = max(0, len(self._buffer) - len(self.delimiter))
+            remaining = deadline - time.monotonic()
+            try:
+                chunk = self._chunks.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                # La JVM est peut-être bloquée sur ce diagramme : inutile d'attendre sa sortie.
+                self.kill()
+                raise subprocess.TimeoutExpired(self._process.args, self.timeout) from None
+            if not chunk:
+                raise PlantUMLWorkerError("le processus PlantUML -pipe s'est arrêté")
+            self._buffer += chunk
+
+    def kill(self) -> None:
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+
+    def close(self) -> None:
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()  # type: ignore[union-attr]
+                self._process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+
+    def __enter__(self) -> PlantUMLWorker:
+        return self
 
-    cmd_pdf = _plantuml_base_command() + ["-tpdf", "-o", str(out_dir), str(puml_path)]
-    subprocess.run(cmd_pdf, check=True)
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
+
+_pipe_worker: PlantUMLWorker | None = None
+_pipe_unavailable = False
+
+
+def _shared_pipe_worker() -> PlantUMLWorker | None:
+    # Un worker par processus, démarré au premier rendu et arrêté à la sortie.
+    global _pipe_worker, _pipe_unavailable
+    if _pipe_unavailable:
+        return None
+    if _pipe_worker is None:
+        try:
+            _pipe_worker = PlantUMLWorker(_plantuml_base_command())
+        except OSError:
+            _pipe_unavailable = True
+            return None
+        atexit.register(_pipe_worker.close)
+    return _pipe_worker
+
+
+def _disable_pipe_worker() -> None:
+    global _pipe_worker, _pipe_unavailable
+    _pipe_unavailable = True
+    if _pipe_worker is not None:
+        _pipe_worker.close()
+        _pipe_worker = None
+
+
+def _checked_pdf(puml_path: Path, pdf_path: Path) -> Path:
     if pdf_path.exists() and pdf_path.stat().st_size > 0:
         return pdf_path
 
@@ -72,6 +291,178 @@ def render_pdf(puml_path: Path, out_dir: Path) -> Path:
     )
 
 
+_MAX_BATCH = 128
+
+
+async def _run_plantuml(command: list[str], slots: asyncio.Semaphore, timeout: float | None) -> None:
+    async with slots:
+        process = await asyncio.create_subprocess_exec(*command)
+        try:
+            returncode = await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(command, timeout) from None
+        finally:
+            # Délai dépassé ou tâche annulée : la JVM ne doit pas survivre.
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+async def run_plantuml_jobs(
+    commands: Iterable[list[str]],
+    max_concurrency: int = 1,
+    timeout: float | None = None,
+) -> None:
+    """Lance des commandes PlantUML, au plus max_concurrency à la fois.
+
+    Un processus qui dépasse timeout secondes est tué (TimeoutExpired). Au
+    premier échec, les commandes en cours ou en attente sont annulées et
+    l'erreur du premier job fautif (dans l'ordre des commandes) est relancée.
+    """
+    slots = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [asyncio.ensure_future(_run_plantuml(command, slots, timeout)) for command in commands]
+    if not tasks:
+        return
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()  # type: ignore[misc]
+
+
+def render_many(
+    puml_paths: Iterable[Path],
+    out_dir: Path,
+    use_pipe: bool = False,
+    max_concurrency: int = 1,
+    timeout: float | None = None,
+) -> dict[Path, Path]:
+    """Rend plusieurs diagrammes avec le moins de lancements PlantUML possible.
+
+    Hors mode -pipe, les diagrammes sont répartis en au plus max_concurrency
+    lots rendus en parallèle par run_plantuml_jobs ; timeout borne chaque
+    processus PlantUML (ou chaque rendu du worker -pipe).
+    Renvoie, dans l'ordre des sources, la correspondance .puml -> .pdf ; chaque
+    PDF est vérifié comme le fait render_pdf.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sources = list(dict.fromkeys(puml_paths))
+    pdf_paths = {puml_path: out_dir / f"{puml_path.stem}.pdf" for puml_path in sources}
+    if len(set(pdf_paths.values())) < len(sources):
+        # PlantUML nomme chaque PDF d'après le .puml dans le répertoire -o.
+        raise ValueError(f"Plusieurs diagrammes produiraient le même PDF dans {out_dir}")
+
+    pending = sources
+    worker = _shared_pipe_worker() if use_pipe and sources else None
+    if worker is not None:
+        if timeout is not None:
+            worker.timeout = timeout
+        pending = []
+        for index, puml_path in enumerate(sources):
+            try:
+                pdf_paths[puml_path].write_bytes(worker.render(puml_path.read_bytes()))
+            except subprocess.TimeoutExpired:
+                # Un diagramme trop long le resterait en mode direct : pas de nouvel essai.
+                _disable_pipe_worker()
+                raise
+            except PlantUMLWorkerError as exc:
+                print(f"PlantUML -pipe indisponible ({exc}), retour au mode direct", file=sys.stderr)
+                _disable_pipe_worker()
+                pending = sources[index:]
+                break
+
+    if pending:
+        base_command = _plantuml_base_command()
+        workers = max(1, min(max_concurrency, len(pending)))
+        size = min(_MAX_BATCH, -(-len(pending) // workers))
+        # -nbthread : chaque JVM répartit son lot sur sa part des cœurs.
+        threads = str(max(1, (os.cpu_count() or 1) // workers))
+        commands = []
+        for start in range(0, len(pending), size):
+            batch = [str(p) for p in pending[start : start + size]]
+            options = ["-nbthread", threads] if len(batch) > 1 else []
+            commands.append(base_command + ["-tpdf"] + options + ["-o", str(out_dir)] + batch)
+        asyncio.run(run_plantuml_jobs(commands, max_concurrency=workers, timeout=timeout))
+
+    return {puml_path: _checked_pdf(puml_path, pdf_paths[puml_path]) for puml_path in sources}
+
+
+def render_pdf(puml_path: Path, out_dir: Path, use_pipe: bool = False, timeout: float | None = None) -> Path:
+    return render_many([puml_path], out_dir, use_pipe=use_pipe, timeout=timeout)[puml_path]
+
+
+def merge_pdfs(pdf_paths: Iterable[Path], target: Path) -> Path:
+    """Concatène des PDF avec pdfunite (poppler) ou, à défaut, pypdf."""
+    pdf_paths = list(pdf_paths)
+    pdfunite = shutil.which("pdfunite")
+    if pdfunite:
+        subprocess.run([pdfunite] + [str(p) for p in pdf_paths] + [str(target)], check=True)
+        return target
+
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        raise RuntimeError("Fusion des PDF impossible : installez poppler (pdfunite) ou pypdf.") from None
+    writer = PdfWriter()
+    for path in pdf_paths:
+        writer.append(str(path))
+    with target.open("wb") as handle:
+        writer.write(handle)
+    return target
+
+
+def _remove_stale(directory: Path, pattern: str, keep: Iterable[Path]) -> None:
+    keep = set(keep)
+    for path in directory.glob(pattern):
+        if path not in keep:
+            path.unlink()
+
+
+@dataclass
+class GenerationResult:
+    schema_txt: Path | None
+    puml: Path
+    pdf: Path | None
+    exports: list[Path]
+    parts: list[Path] = field(default_factory=list)
+    merged_pdf: Path | None = None
+    stamps: dict = field(default_factory=dict)
+    skipped: list[str] = field(default_factory=list)
+    profile: list[dict] = field(default_factory=list)
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprint(*parts: object) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _code_fingerprint() -> str:
+    # Toute évolution du compilateur ou des rendus invalide les sorties.
+    here = Path(__file__).resolve().parent
+    return _fingerprint(*(_sha256_file(here / name) for name in ("parser.py", "renderers.py")))
+
+
+def _outputs_intact(recorded: dict[str, str], expected: Iterable[Path]) -> bool:
+    # Les sous-mindmaps, non connues d'avance, figurent en plus dans recorded.
+    expected_names = {str(path) for path in expected}
+    if not expected_names <= set(recorded):
+        return False
+    return all(Path(name).exists() and _sha256_file(Path(name)) == sha for name, sha in recorded.items())
+
+
 def generate_one(
     schema_path: Path,
     root: str,
@@ -79,21 +470,314 @@ def generate_one(
     schema_output_dir: Path,
     puml_output_dir: Path,
     pdf_output_dir: Path,
-) -> tuple[Path, Path, Path]:
-    schema_txt = Path(
-        parse(
-            input_path=str(schema_path),
-            output_dir=str(schema_output_dir),
-            root=root,
-            ignored_keys_path=str(ignored_keys_path) if ignored_keys_path else None,
+    cache: CompileCache | None = None,
+    write_schema_txt: bool = True,
+    export_formats: Iterable[str] = (),
+    export_output_dir: Path | None = None,
+    plantuml_pipe: bool = False,
+    previous_stamps: dict | None = None,
+    force: bool = False,
+    toolchain_cache: Path | None = None,
+    split_depth: int | None = None,
+    split_nodes: int | None = None,
+    merge_pdf: bool = False,
+    render_pdfs: bool = True,
+    pool: CompilerPool | None = None,
+    plantuml_concurrency: int = 1,
+    plantuml_timeout: float | None = None,
+    profile: bool = False,
+) -> GenerationResult:
+    """Compile une racine, écrit ses sorties puis le PDF.
+
+    previous_stamps est l'entrée du manifeste de la génération précédente :
+    compilation/émission et rendu PDF sont sautés quand leurs entrées n'ont
+    pas changé et que leurs sorties sont intactes (sauf si force).
+
+    Avec split_depth ou split_nodes, la mindmap est découpée en une vue
+    d'ensemble ({root}.puml) et des sous-mindmaps ({root}.part-NNN.puml),
+    rendues ensemble ; merge_pdf les réunit dans {root}.all.pdf.
+    render_pdfs=False saute toute l'étape PlantUML (ni Java ni PDF).
+    pool garde le schéma chargé et le mémo de types d'un appel à l'autre.
+    plantuml_concurrency et plantuml_timeout sont transmis à render_many.
+    profile mesure chaque étape exécutée (GenerationResult.profile).
+    """
+    profiler = StageProfiler(enabled=profile).start()
+    try:
+        root_name = root_output_name(root)
+        schema_txt = schema_output_dir / f"{root_name}.schema.txt" if write_schema_txt else None
+        puml_path = puml_output_dir / f"{root}.puml"
+        outputs = {"puml": puml_path}
+        if schema_txt is not None:
+            outputs["txt"] = schema_txt
+        exports: list[Path] = []
+        for fmt in export_formats:
+            outputs[fmt] = (export_output_dir or puml_output_dir) / f"{root}{SINKS[fmt].suffix}"
+            exports.append(outputs[fmt])
+
+        previous = {} if force else (previous_stamps or {})
+        skipped: list[str] = []
+        emit_key = _fingerprint(
+            _sha256_file(schema_path),
+            _sha256_file(ignored_keys_path) if ignored_keys_path else None,
+            root,
+            sorted((fmt, str(path)) for fmt, path in outputs.items()),
+            _code_fingerprint(),
+            split_depth,
+            split_nodes,
         )
-    )
+        split = split_depth is not None or split_nodes is not None
+        if previous.get("emit") == emit_key and _outputs_intact(previous.get("outputs", {}), outputs.values()):
+            skipped.append("emit")
+            output_stamps = previous["outputs"]
+            parts = [Path(name) for name in previous.get("parts", [])]
+        else:
+            [(root_name, expr)] = compile_many(
+                input_path=str(schema_path),
+                roots=[root],
+                ignored_keys_path=str(ignored_keys_path) if ignored_keys_path else None,
+                cache=cache,
+                pool=pool,
+                profiler=profiler,
+            )
+            for path in outputs.values():
+                path.parent.mkdir(parents=True, exist_ok=True)
+            sink_types = {}
+            if split:
+
+                def part_path(number: int) -> Path:
+                    return puml_output_dir / f"{root}.part-{number:03d}.puml"
+
+                sink_types["puml"] = partial(
+                    SplitPumlSink, part_path=part_path, max_depth=split_depth, max_nodes=split_nodes
+                )
+            with profiler.stage("emit", formats=sorted(outputs)) as record:
+                sinks = render_files(root_name, expr, outputs, title=f"{root} mindmap", sink_types=sink_types)
+                parts = getattr(sinks["puml"], "parts", [])
+                _remove_stale(puml_output_dir, f"{root}.part-*.puml", parts)
+                record["parts"] = len(parts)
+                record["output_bytes"] = sum(path.stat().st_size for path in [*outputs.values(), *parts])
+            output_stamps = {str(path): _sha256_file(path) for path in [*outputs.values(), *parts]}
+
+        if not render_pdfs:
+            stamps = {"emit": emit_key, "outputs": output_stamps, "parts": [str(path) for path in parts]}
+            return GenerationResult(schema_txt, puml_path, None, exports, parts, None, stamps, skipped, profiler.stages)
+
+        with profiler.stage("toolchain"):
+            toolchain = plantuml_toolchain(toolchain_cache, force=force)
+        diagrams = [puml_path, *parts]
+        pdf_key = _fingerprint(
+            [output_stamps[str(path)] for path in diagrams], toolchain.command, toolchain.version, merge_pdf
+        )
+        pdf_path = pdf_output_dir / f"{puml_path.stem}.pdf"
+        merged_pdf = pdf_output_dir / f"{root}.all.pdf" if merge_pdf else None
+        pdf_paths = [pdf_output_dir / f"{path.stem}.pdf" for path in diagrams]
+        if merged_pdf is not None:
+            pdf_paths.append(merged_pdf)
+        if previous.get("pdf") == pdf_key and all(path.exists() and path.stat().st_size > 0 for path in pdf_paths):
+            skipped.append("pdf")
+        else:
+            # Plusieurs diagrammes : un lot -nbthread parallélise mieux que le worker -pipe.
+            with profiler.stage("pdf", diagrams=len(diagrams)) as record:
+                rendered = render_many(
+                    diagrams,
+                    pdf_output_dir,
+                    use_pipe=plantuml_pipe and not parts,
+                    max_concurrency=plantuml_concurrency,
+                    timeout=plantuml_timeout,
+                )
+                record["output_bytes"] = sum(path.stat().st_size for path in rendered.values())
+            confirm_pdf_support(toolchain, toolchain_cache)
+            pdf_path = rendered[puml_path]
+            _remove_stale(pdf_output_dir, f"{root}.part-*.pdf", rendered.values())
+            if merged_pdf is not None:
+                with profiler.stage("merge"):
+                    merge_pdfs(rendered.values(), merged_pdf)
+
+        stamps = {"emit": emit_key, "outputs": output_stamps, "parts": [str(path) for path in parts], "pdf": pdf_key}
+        return GenerationResult(
+            schema_txt, puml_path, pdf_path, exports, parts, merged_pdf, stamps, skipped, profiler.stages
+        )
+
+    finally:
+        profiler.stop()
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_manifest(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _run_job(kwargs: dict) -> tuple[GenerationResult, CompileCache | None]:
+    # Exécuté dans un processus fils : le cache revient avec ses compteurs.
+    return generate_one(**kwargs), kwargs.get("cache")
+
+
+def run_jobs(
+    jobs: list[dict],
+    max_workers: int = 1,
+    cache: CompileCache | None = None,
+) -> list[GenerationResult]:
+    """Lance plusieurs generate_one, en parallèle si max_workers > 1.
+
+    Les résultats sont rendus dans l'ordre des jobs ; en cas d'échec,
+    l'exception du premier job fautif (dans cet ordre) est relancée.
+    """
+    workers = max(1, min(max_workers, len(jobs)))
+    if workers == 1:
+        return [generate_one(**kwargs) for kwargs in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job, kwargs) for kwargs in jobs]
+        outcomes = [(future.exception(), future) for future in futures]
+
+    results = []
+    for error, future in outcomes:
+        if error is not None:
+            raise error
+        result, job_cache = future.result()
+        if cache is not None and job_cache is not None:
+            cache.merge_stats(job_cache)
+        results.append(result)
+    return results
+
+
+class _Inotify:
+    """Réveil sur écriture dans des répertoires (inotify Linux, via ctypes)."""
+
+    # IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    _MASK = 0x8 | 0x40 | 0x80 | 0x100 | 0x200
 
-    puml_output_dir.mkdir(parents=True, exist_ok=True)
-    puml_path = puml_output_dir / f"{root}.puml"
-    schema_txt_to_puml(schema_txt, puml_path, title=f"{root} mindmap")
-    pdf_path = render_pdf(puml_path, pdf_output_dir)
-    return schema_txt, puml_path, pdf_path
+    def __init__(self, directories: Iterable[Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        for directory in directories:
+            if libc.inotify_add_watch(self._fd, os.fsencode(directory), self._MASK) < 0:
+                errno = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(errno, f"inotify_add_watch {directory}")
+
+    def wait(self, timeout: float) -> None:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self._fd, 1 << 16):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def watch(
+    jobs: list[tuple[str, dict]],
+    manifest: dict,
+    manifest_path: Path,
+    interval: float = 1.0,
+    on_results=None,
+) -> None:
+    """Régénère les racines dont le schéma ou les clés ignorées changent.
+
+    Tout se déroule dans ce processus : un CompilerPool garde les schémas
+    chargés et les mémos de types d'une itération à l'autre, et le manifeste
+    saute les étapes dont les entrées n'ont pas bougé. inotify réveille la
+    boucle dès qu'un fichier est écrit ; à défaut, les fichiers sont sondés
+    toutes les interval secondes.
+    """
+    pool = CompilerPool()
+    inputs = {
+        index: [path for path in (kwargs["schema_path"], kwargs.get("ignored_keys_path")) if path is not None]
+        for index, (_, kwargs) in enumerate(jobs)
+    }
+    watched = {path for paths in inputs.values() for path in paths}
+    try:
+        notifier: _Inotify | None = _Inotify({path.parent for path in watched})
+    except (OSError, AttributeError):
+        notifier = None
+
+    def run(indexes: list[int]) -> None:
+        selected = []
+        for index in indexes:
+            label, kwargs = jobs[index]
+            try:
+                result = generate_one(**dict(kwargs, previous_stamps=manifest.get(kwargs["root"]), pool=pool))
+            except Exception as exc:
+                print(f"Erreur ({label}): {exc}", file=sys.stderr)
+                continue
+            manifest[kwargs["root"]] = result.stamps
+            selected.append(((label, kwargs), result))
+        _save_manifest(manifest_path, manifest)
+        if on_results is not None:
+            on_results(selected)
+
+    stamps = {path: _file_stamp(path) for path in watched}
+    run(list(inputs))
+    mode = "inotify" if notifier is not None else f"sondage toutes les {interval:g} s"
+    print(f"Surveillance de {len(watched)} fichiers ({mode}), Ctrl+C pour arrêter", file=sys.stderr)
+    try:
+        while True:
+            if notifier is not None:
+                notifier.wait(interval)
+            else:
+                time.sleep(interval)
+            current = {path: _file_stamp(path) for path in watched}
+            changed = {path for path in watched if current[path] != stamps[path]}
+            if not changed:
+                continue
+            # Laisse l'éditeur finir d'écrire avant de relire.
+            time.sleep(0.1)
+            stamps = {path: _file_stamp(path) for path in watched}
+            for path in sorted(changed):
+                print(f"Modifié : {path}", file=sys.stderr)
+            run([index for index, paths in inputs.items() if changed.intersection(paths)])
+    except KeyboardInterrupt:
+        print("Surveillance arrêtée", file=sys.stderr)
+    finally:
+        if notifier is not None:
+            notifier.close()
+
+
+def _print_results(selected: list[tuple[tuple[str, dict], GenerationResult]]) -> None:
+    for (label, _), result in selected:
+        print(label)
+        print(f"- schema: {result.schema_txt or '-'}")
+        print(f"- puml:   {result.puml}")
+        print(f"- pdf:    {result.pdf or '-'}")
+        if result.parts:
+            print(f"- sous-mindmaps: {len(result.parts)}")
+        if result.merged_pdf is not None:
+            print(f"- pdf complet: {result.merged_pdf}")
+        for export in result.exports:
+            print(f"- export: {export}")
+        if result.skipped:
+            print(f"- inchangé: {', '.join(result.skipped)}")
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"doit être un entier >= 1 : {value}")
+    return number
 
 
 def main() -> None:
@@ -108,6 +792,72 @@ def main() -> None:
     cli.add_argument("--schema-out", default="generated/schemas")
     cli.add_argument("--puml-out", default="generated/puml")
     cli.add_argument("--pdf-out", default="generated/pdf")
+    cli.add_argument("--cache-dir", default="generated/.cache", help="Cache des schémas compilés")
+    cli.add_argument("--no-cache", action="store_true", help="Désactive le cache de compilation")
+    cli.add_argument("--no-schema-txt", action="store_true", help="N'écrit pas les pseudo-schémas .schema.txt")
+    cli.add_argument(
+        "--export",
+        action="append",
+        default=[],
+        choices=["json", "mermaid", "dot", "svg"],
+        help="Format supplémentaire écrit pendant le même parcours (répétable)",
+    )
+    cli.add_argument("--export-out", default="generated/exports")
+    cli.add_argument(
+        "--no-plantuml-pipe",
+        action="store_true",
+        help="Lance une JVM PlantUML par diagramme au lieu d'un worker -pipe persistant",
+    )
+    cli.add_argument(
+        "--plantuml-jobs",
+        type=_positive_int,
+        default=2,
+        help="Processus PlantUML lancés en parallèle par génération (hors mode -pipe)",
+    )
+    cli.add_argument(
+        "--plantuml-timeout",
+        type=float,
+        default=600.0,
+        help="Durée maximale d'un processus PlantUML, en secondes (0 = illimitée)",
+    )
+    cli.add_argument(
+        "--no-pdf",
+        action="store_true",
+        help="Saute le rendu PlantUML (avec --export svg : aperçu sans Java)",
+    )
+    cli.add_argument(
+        "--split-depth",
+        type=_positive_int,
+        help="Découpe la mindmap en sous-mindmaps tous les N niveaux",
+    )
+    cli.add_argument(
+        "--split-nodes",
+        type=_positive_int,
+        help="Découpe la mindmap en branches d'au plus N nœuds",
+    )
+    cli.add_argument("--merge-pdf", action="store_true", help="Réunit vue d'ensemble et sous-mindmaps dans un seul PDF")
+    cli.add_argument("--manifest", default="generated/.manifest.json", help="Manifeste des générations précédentes")
+    cli.add_argument("--force", action="store_true", help="Régénère toutes les étapes sans consulter le manifeste")
+    cli.add_argument(
+        "--watch",
+        action="store_true",
+        help="Surveille schémas et clés ignorées et régénère les racines touchées (un seul processus)",
+    )
+    cli.add_argument("--watch-interval", type=float, default=1.0, help="Période de sondage de --watch, en secondes")
+    cli.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="JSON",
+        help="Écrit un rapport JSON des étapes par racine ; sans chemin, sur la sortie d'erreur (ignoré avec --watch)",
+    )
+    cli.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Nombre de générations menées en parallèle (1 = séquentiel)",
+    )
 
     args = cli.parse_args()
     base_dir = Path(args.base_dir).resolve()
@@ -120,40 +870,84 @@ def main() -> None:
     schema_out = (base_dir / args.schema_out).resolve()
     puml_out = (base_dir / args.puml_out).resolve()
     pdf_out = (base_dir / args.pdf_out).resolve()
+    export_out = (base_dir / args.export_out).resolve()
+    cache = None if args.no_cache else CompileCache((base_dir / args.cache_dir).resolve())
+    manifest_path = (base_dir / args.manifest).resolve()
+    manifest = _load_manifest(manifest_path)
 
-    try:
-        capec_schema_txt, capec_puml, capec_pdf = generate_one(
-            schema_path=capec_schema,
-            root="attack_pattern",
-            ignored_keys_path=capec_ignored if capec_ignored.exists() else None,
-            schema_output_dir=schema_out,
-            puml_output_dir=puml_out,
-            pdf_output_dir=pdf_out,
-        )
+    common = dict(
+        schema_output_dir=schema_out,
+        puml_output_dir=puml_out,
+        pdf_output_dir=pdf_out,
+        cache=cache,
+        write_schema_txt=not args.no_schema_txt,
+        export_formats=args.export,
+        export_output_dir=export_out,
+        plantuml_pipe=not args.no_plantuml_pipe,
+        force=args.force,
+        split_depth=args.split_depth,
+        split_nodes=args.split_nodes,
+        merge_pdf=args.merge_pdf,
+        render_pdfs=not args.no_pdf,
+        plantuml_concurrency=args.plantuml_jobs,
+        plantuml_timeout=args.plantuml_timeout or None,
+        profile=args.profile is not None and not args.watch,
+        toolchain_cache=None if args.no_cache else (base_dir / args.cache_dir / "plantuml-toolchain.json").resolve(),
+    )
+    jobs = [
+        (
+            "CAPEC",
+            dict(
+                common,
+                schema_path=capec_schema,
+                root="attack_pattern",
+                ignored_keys_path=capec_ignored if capec_ignored.exists() else None,
+                previous_stamps=manifest.get("attack_pattern"),
+            ),
+        ),
+        (
+            "CWE",
+            dict(
+                common,
+                schema_path=cwe_schema,
+                root="weakness",
+                ignored_keys_path=cwe_ignored if cwe_ignored.exists() else None,
+                previous_stamps=manifest.get("weakness"),
+            ),
+        ),
+    ]
 
-        cwe_schema_txt, cwe_puml, cwe_pdf = generate_one(
-            schema_path=cwe_schema,
-            root="weakness",
-            ignored_keys_path=cwe_ignored if cwe_ignored.exists() else None,
-            schema_output_dir=schema_out,
-            puml_output_dir=puml_out,
-            pdf_output_dir=pdf_out,
-        )
+    if args.watch:
+        watch(jobs, manifest, manifest_path, interval=args.watch_interval, on_results=_print_results)
+        return
+
+    profiler = StageProfiler(enabled=args.profile is not None)
+    try:
+        with profiler.stage("total", jobs=args.jobs):
+            results = run_jobs([kwargs for _, kwargs in jobs], max_workers=args.jobs, cache=cache)
     except subprocess.CalledProcessError as exc:
         print(f"Erreur PlantUML: commande échouée ({exc})", file=sys.stderr)
         sys.exit(2)
+    except subprocess.TimeoutExpired as exc:
+        print(f"Erreur PlantUML: délai dépassé ({exc})", file=sys.stderr)
+        sys.exit(2)
     except Exception as exc:
         print(f"Erreur: {exc}", file=sys.stderr)
         sys.exit(1)
 
-    print("CAPEC")
-    print(f"- schema: {capec_schema_txt}")
-    print(f"- puml:   {capec_puml}")
-    print(f"- pdf:    {capec_pdf}")
-    print("CWE")
-    print(f"- schema: {cwe_schema_txt}")
-    print(f"- puml:   {cwe_puml}")
-    print(f"- pdf:    {cwe_pdf}")
+    for (_, kwargs), result in zip(jobs, results):
+        manifest[kwargs["root"]] = result.stamps
+    _save_manifest(manifest_path, manifest)
+
+    _print_results(list(zip(jobs, results)))
+    if args.profile is not None:
+        roots = {
+            kwargs["root"]: {"stages": result.profile, "skipped": result.skipped}
+            for (_, kwargs), result in zip(jobs, results)
+        }
+        write_report(profiler.report(command="generate_mindmaps", roots=roots), args.profile)
+    if cache is not None:
+        print(cache.summary())
 
 
 if __name__ == "__main__":
@@ -1,31 +1,120 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import marshal
+import os
 import re
-from dataclasses import dataclass
+import sys
+from fnmatch import fnmatchcase
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Generator, Iterable, Iterator, TextIO, TypeVar
 import xml.etree.ElementTree as ET
 
+from profiling import NO_PROFILE, StageProfiler, write_report
 
-XSD_NS = "{http://www.w3.org/2001/XMLSchema}"
 
+_T = TypeVar("_T")
+_Task = Generator[Any, Any, _T]
 
-@dataclass
-class Expr:
+XSD_NS = "{http://www.w3.org/2001/XMLSchema}"
+XSD_ANNOTATION = f"{XSD_NS}annotation"
+_BUILTIN_TYPES = frozenset(
+    {
+        "string",
+        "integer",
+        "int",
+        "long",
+        "short",
+        "nonNegativeInteger",
+        "positiveInteger",
+        "boolean",
+        "date",
+        "gYear",
+        "gMonth",
+        "gDay",
+        "anyURI",
+        "decimal",
+        "double",
+        "float",
+        "token",
+        "normalizedString",
+    }
+)
+_BROKEN_DOCUMENTATION_TAG = re.compile(rb"<(/?)x/[^>]*:documentation>")
+_NON_ALNUM = re.compile(r"[^0-9A-Za-z]+")
+_CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+_GLOB_TOKEN = re.compile(r"(\*+|\?|\[[^\]]*\])")
+_NO_SHAPE: dict[str, list[ET.Element]] = {}
+_MAX_WARM_MEMOS = 8
+
+
+class _Interned:
+    """Nœud immuable et partagé (hash-consing).
+
+    Deux nœuds structurellement identiques sont le même objet : l'égalité et le
+    hachage se réduisent à l'identité. La table d'internement vit aussi
+    longtemps que le processus ; elle est bornée par le nombre de nœuds
+    distincts des schémas compilés.
+    """
+
+    __slots__ = ()
+    _table: dict[tuple, _Interned]
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        cls._table = {}
+
+    @classmethod
+    def _intern(cls, key: tuple) -> Any:
+        node = cls._table.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            for slot, value in zip(cls.__slots__, key):
+                object.__setattr__(node, slot, value)
+            cls._table[key] = node
+        return node
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} est immuable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} est immuable")
+
+    def __reduce__(self) -> tuple:
+        # pickle et copy repassent par __new__ : le nœud restauré est ré-interné.
+        return (type(self), tuple(getattr(self, slot) for slot in self.__slots__))
+
+    def __repr__(self) -> str:
+        values = ", ".join(repr(getattr(self, slot)) for slot in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class Expr(_Interned):
+    __slots__ = ("kind", "value")
     kind: str
     value: object
 
+    def __new__(cls, kind: str, value: object) -> Expr:
+        if kind == "object":
+            value = tuple(value)  # type: ignore[call-overload]
+        return cls._intern((kind, value))
+
 
-@dataclass
-class Field:
+class Field(_Interned):
+    __slots__ = ("name", "expr")
     name: str
     expr: Expr
 
+    def __new__(cls, name: str, expr: Expr) -> Field:
+        return cls._intern((name, expr))
 
+
+@lru_cache(maxsize=None)
 def _snake_case(name: str) -> str:
-    cleaned = re.sub(r"[^0-9A-Za-z]+", "_", name)
-    cleaned = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", cleaned)
+    cleaned = _NON_ALNUM.sub("_", name)
+    cleaned = _CAMEL_BOUNDARY.sub(r"\1_\2", cleaned)
     return cleaned.strip("_").lower()
 
 
@@ -39,6 +128,30 @@ def _strip_ns(tag_or_type: str) -> str:
     return tag_or_type
 
 
+def root_output_name(root_identifier: str) -> str:
+    """Nom sous lequel une racine est rendue (et ses fichiers nommés)."""
+    return _snake_case(root_identifier)
+
+
+def _normalize_glob_segment(segment: str) -> str:
+    # Les parties littérales passent en snake_case comme les noms de champs ;
+    # les jokers restent tels quels et les séparateurs qui les bordent sont gardés.
+    parts = _GLOB_TOKEN.split(segment)
+    for index in range(0, len(parts), 2):
+        parts[index] = _CAMEL_BOUNDARY.sub(r"\1_\2", _NON_ALNUM.sub("_", parts[index]))
+    return "".join(parts).lower()
+
+
+def _normalize_ignore_rule(rule: str) -> str:
+    segments = []
+    for segment in rule.split("."):
+        if "*" in segment or "?" in segment or "[" in segment:
+            segments.append(_normalize_glob_segment(segment))
+        else:
+            segments.append(_snake_case(segment))
+    return ".".join(segments)
+
+
 def _read_ignored_keys(ignored_keys_path: str | None) -> set[str]:
     if not ignored_keys_path:
         return set()
@@ -50,43 +163,251 @@ def _read_ignored_keys(ignored_keys_path: str | None) -> set[str]:
         line = raw.strip()
         if not line or line.startswith("#"):
             continue
-        ignored.add(_snake_case(line))
+        ignored.add(_normalize_ignore_rule(line))
     return ignored
 
 
+class _IgnoreMatcher:
+    """Automate des règles d'exclusion, avancé champ par champ.
+
+    Une règle est un chemin pointé depuis la racine (``attack_pattern.*.notes``)
+    dont chaque segment est un nom, un motif glob (``*``, ``related_*``) ou
+    ``**`` (zéro ou plusieurs segments) ; un nom seul équivaut à ``**.nom``.
+    Un état est l'ensemble des positions atteintes dans les règles ; états et
+    transitions sont mémorisés, si bien qu'avancer d'un champ revient à une
+    recherche dans un dictionnaire.
+    """
+
+    def __init__(self, rules: Iterable[str]):
+        self._rules: list[tuple[str, ...]] = []
+        for rule in sorted(set(rules)):
+            segments = tuple(rule.split("."))
+            if len(segments) == 1:
+                segments = ("**",) + segments
+            self._rules.append(segments)
+        self._globs = {
+            segment
+            for segments in self._rules
+            for segment in segments
+            if segment != "**" and any(c in segment for c in "*?[")
+        }
+        self._state_ids: dict[frozenset[tuple[int, int]], int] = {}
+        self._states: list[frozenset[tuple[int, int]]] = []
+        self._transitions: dict[tuple[int, str], tuple[int, bool]] = {}
+        self.start = self._state_id(self._closure((r, 0) for r in range(len(self._rules))))
+
+    def _closure(self, positions: Iterable[tuple[int, int]]) -> frozenset[tuple[int, int]]:
+        result = set(positions)
+        pending = list(result)
+        while pending:
+            r, i = pending.pop()
+            if i < len(self._rules[r]) and self._rules[r][i] == "**" and (r, i + 1) not in result:
+                result.add((r, i + 1))
+                pending.append((r, i + 1))
+        return frozenset(result)
+
+    def _state_id(self, positions: frozenset[tuple[int, int]]) -> int:
+        state = self._state_ids.get(positions)
+        if state is None:
+            state = self._state_ids[positions] = len(self._states)
+            self._states.append(positions)
+        return state
+
+    def step(self, state: int, name: str) -> tuple[int, bool]:
+        """Avance d'un champ ; renvoie le nouvel état et si le champ est ignoré."""
+        transition = self._transitions.get((state, name))
+        if transition is not None:
+            return transition
+        moved: set[tuple[int, int]] = set()
+        for r, i in self._states[state]:
+            segments = self._rules[r]
+            if i == len(segments):
+                continue
+            segment = segments[i]
+            if segment == "**":
+                moved.add((r, i))
+            elif segment == name or (segment in self._globs and fnmatchcase(name, segment)):
+                moved.add((r, i + 1))
+        closed = self._closure(moved)
+        ignored = any(i == len(self._rules[r]) for r, i in closed)
+        transition = self._transitions[(state, name)] = (self._state_id(closed), ignored)
+        return transition
+
+
+def _leaf_text(expr: Expr) -> str | None:
+    if expr.kind == "scalar":
+        return str(expr.value)
+    if expr.kind == "ref":
+        return f"ref<{expr.value}>"
+    return None
+
+
+class _SanitizingReader:
+    """Lecteur binaire qui corrige les balises <x/...:documentation> à la volée.
+
+    Tout ce qui suit le dernier '>' d'un bloc est retenu jusqu'au bloc suivant,
+    de sorte qu'une balise coupée entre deux lectures est toujours réécrite
+    d'un seul tenant.
+    """
+
+    _CHUNK = 64 * 1024
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._tail = b""
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b"".join(iter(lambda: self.read(self._CHUNK), b""))
+        while True:
+            data = self._raw.read(max(size, 1))
+            if not data:
+                ready, self._tail = self._tail, b""
+                return self._sanitize(ready)
+            buf = self._tail + data
+            cut = buf.find(b"<", buf.rfind(b">") + 1)
+            if cut < 0:
+                cut = len(buf)
+            ready, self._tail = buf[:cut], buf[cut:]
+            if ready:
+                return self._sanitize(ready)
+
+    @staticmethod
+    def _sanitize(chunk: bytes) -> bytes:
+        return _BROKEN_DOCUMENTATION_TAG.sub(rb"<\1xs:documentation>", chunk)
+
+
 class XSDSchemaCompiler:
     def __init__(self, schema_path: str, ignored_keys: Iterable[str] | None = None):
         self.schema_path = Path(schema_path)
-        self.tree = self._load_tree(self.schema_path)
-        self.root = self.tree.getroot()
         self.simple_types: dict[str, ET.Element] = {}
         self.complex_types: dict[str, ET.Element] = {}
         self.global_elements: dict[str, ET.Element] = {}
+        self._shapes: dict[ET.Element, dict[str, list[ET.Element]]] = {}
         self.ignored_keys = set(ignored_keys or ())
-        self._index_schema()
+        self._ignore = _IgnoreMatcher(self.ignored_keys)
+        self._type_memo: dict[tuple[str, ...], Expr] = {}
+        self._warm_memos: dict[frozenset[str], tuple[_IgnoreMatcher, dict[tuple[str, ...], Expr]]] = {}
+        self._open_cycles: dict[int, set[str]] = {}
+        self.memo_hits = 0
+        self.peak_stack_depth = 0
+        self.pruned_fields = 0
+        self.tree = self._load_tree(self.schema_path)
+        self.root = self.tree.getroot()
+        self._cycles = self._type_cycles()
 
     def _load_tree(self, schema_path: Path) -> ET.ElementTree:
-        try:
-            return ET.parse(schema_path)
-        except ET.ParseError:
-            raw = schema_path.read_text(encoding="utf-8")
-            sanitized = re.sub(r"<x/[^>]*:documentation>", "<xs:documentation>", raw)
-            sanitized = re.sub(r"</x/[^>]*:documentation>", "</xs:documentation>", sanitized)
-            root = ET.fromstring(sanitized)
-            return ET.ElementTree(root)
-
-    def _index_schema(self) -> None:
-        for child in self.root:
-            local = _strip_ns(child.tag)
-            name = child.get("name")
-            if not name:
+        # Une seule passe : le flux est toujours corrigé à la volée, qu'il
+        # contienne ou non des balises <x/...:documentation>.
+        with schema_path.open("rb") as raw:
+            return self._stream_tree(_SanitizingReader(raw))
+
+    def _stream_tree(self, source) -> ET.ElementTree:
+        # Les annotations (xs:documentation) pèsent l'essentiel du fichier : on
+        # les détache dès leur fermeture et on indexe les déclarations globales
+        # au fil de l'eau, sans jamais garder l'arbre complet en mémoire.
+        stack: list[ET.Element] = []
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag == XSD_ANNOTATION and stack:
+                stack[-1].remove(elem)
                 continue
-            if local == "simpleType":
-                self.simple_types[name] = child
-            elif local == "complexType":
-                self.complex_types[name] = child
-            elif local == "element":
-                self.global_elements[name] = child
+            self._index_shape(elem)
+            if len(stack) == 1:
+                self._index_node(elem)
+        return ET.ElementTree(elem)
+
+    def _index_shape(self, node: ET.Element) -> None:
+        # Enfants XSD regroupés par nom local, calculés une fois à la fermeture
+        # du nœud : les routines de compilation n'appellent plus find/findall.
+        shape: dict[str, list[ET.Element]] = {}
+        for child in node:
+            tag = child.tag
+            if isinstance(tag, str) and tag.startswith(XSD_NS):
+                shape.setdefault(tag[len(XSD_NS):], []).append(child)
+        if shape:
+            self._shapes[node] = shape
+
+    def _children(self, node: ET.Element, local: str) -> list[ET.Element]:
+        return self._shapes.get(node, _NO_SHAPE).get(local, [])
+
+    def _child(self, node: ET.Element, local: str) -> ET.Element | None:
+        children = self._shapes.get(node, _NO_SHAPE).get(local)
+        return children[0] if children else None
+
+    def _index_node(self, child: ET.Element) -> None:
+        local = _strip_ns(child.tag)
+        name = child.get("name")
+        if not name:
+            return
+        if local == "simpleType":
+            self.simple_types[name] = child
+        elif local == "complexType":
+            self.complex_types[name] = child
+        elif local == "element":
+            self.global_elements[name] = child
+
+    def _type_references(self, node: ET.Element) -> set[str]:
+        references: set[str] = set()
+        for descendant in node.iter():
+            for attribute in ("type", "base"):
+                type_name = descendant.get(attribute)
+                if type_name and self._type_kind(type_name) == "complex":
+                    references.add(_strip_ns(type_name))
+        return references
+
+    def _type_cycles(self) -> dict[str, int]:
+        # Tarjan itératif sur le graphe des complexTypes nommés : chaque type
+        # pris dans un cycle (autoréférence comprise) reçoit le numéro de sa
+        # composante fortement connexe. Les règles d'ignorance ne font que
+        # retirer des arcs, le graphe complet reste donc une borne sûre.
+        graph = {name: sorted(self._type_references(node)) for name, node in self.complex_types.items()}
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        stack: list[str] = []
+        on_stack: set[str] = set()
+        cycles: dict[str, int] = {}
+        components = 0
+        for start in graph:
+            if start in index:
+                continue
+            index[start] = low[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            work = [(start, iter(graph[start]))]
+            while work:
+                name, successors = work[-1]
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = low[successor] = len(index)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(graph[successor])))
+                        break
+                    if successor in on_stack:
+                        low[name] = min(low[name], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[name])
+                    if low[name] != index[name]:
+                        continue
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == name:
+                            break
+                    if len(members) > 1 or name in graph[name]:
+                        for member in members:
+                            cycles[member] = components
+                        components += 1
+        return cycles
 
     def _builtin_scalar(self, xsd_type: str) -> str:
         t = _strip_ns(xsd_type)
@@ -113,11 +434,11 @@ class XSDSchemaCompiler:
         return mapping.get(t, "string")
 
     def _enum_values_from_simple_type(self, node: ET.Element) -> list[str]:
-        restriction = node.find(f"{XSD_NS}restriction")
+        restriction = self._child(node, "restriction")
         if restriction is None:
             return []
         values: list[str] = []
-        for enum_node in restriction.findall(f"{XSD_NS}enumeration"):
+        for enum_node in self._children(restriction, "enumeration"):
             value = enum_node.get("value")
             if value is not None:
                 values.append(value)
@@ -128,7 +449,7 @@ class XSDSchemaCompiler:
         if enums:
             quoted = ", ".join(f'"{v}"' for v in enums)
             return Expr("scalar", f"enum({quoted})")
-        restriction = node.find(f"{XSD_NS}restriction")
+        restriction = self._child(node, "restriction")
         if restriction is not None and restriction.get("base"):
             return Expr("scalar", self._builtin_scalar(restriction.get("base", "xs:string")))
         return Expr("scalar", "string")
@@ -143,47 +464,104 @@ class XSDSchemaCompiler:
             return "text" if ctx in {"technique"} else "content"
         return "value"
 
-    def _expr_for_type_name(self, type_name: str, context_name: str = "") -> Expr:
+    def _type_kind(self, type_name: str) -> str:
         local = _strip_ns(type_name)
-        if type_name.startswith("xs:") or local in {
-            "string",
-            "integer",
-            "int",
-            "long",
-            "short",
-            "nonNegativeInteger",
-            "positiveInteger",
-            "boolean",
-            "date",
-            "gYear",
-            "gMonth",
-            "gDay",
-            "anyURI",
-            "decimal",
-            "double",
-            "float",
-            "token",
-            "normalizedString",
-        }:
-            return Expr("scalar", self._builtin_scalar(type_name))
-
+        if type_name.startswith("xs:") or local in _BUILTIN_TYPES:
+            return "builtin"
         if local == "StructuredTextType":
-            return Expr("scalar", "structured_text")
-
+            return "structured_text"
         if local in self.simple_types:
-            return self._expr_for_simple_type(self.simple_types[local])
-
+            return "simple"
         if local in self.complex_types:
-            return self._expr_for_complex_type(self.complex_types[local], context_name=context_name)
+            return "complex"
+        return "unknown"
+
+    def _type_memo_key(self, type_name: str, context_name: str, state: int) -> tuple:
+        kind = self._type_kind(type_name)
+        local = _strip_ns(type_name)
+        if kind != "complex":
+            return (kind, local)
+
+        # Seul le nom du champ de base d'une extension (_base_value_name)
+        # dépend du contexte : on le déduit en remontant la chaîne d'extensions.
+        base_name = ""
+        seen = {local}
+        extension = self._content_extension(self.complex_types[local])
+        while extension is not None:
+            base = extension.get("base", "xs:string")
+            if self._type_kind(base) != "complex":
+                base_expr = self._scalar_for_type_name(base)
+                base_name = self._base_value_name(str(base_expr.value), context_name)
+                break
+            base_local = _strip_ns(base)
+            if base_local in seen:
+                break
+            seen.add(base_local)
+            extension = self._content_extension(self.complex_types[base_local])
+        return (kind, local, base_name, state)
+
+    def _expr_for_type_name(self, type_name: str, state: int, context_name: str = "") -> _Task[Expr]:
+        key = self._type_memo_key(type_name, context_name, state)
+        local = _strip_ns(type_name)
+        cycle = self._cycles.get(local) if key[0] == "complex" else None
+        expanded = self._open_cycles.get(cycle) if cycle is not None else None
+        if expanded is not None:
+            # Cycle en cours de déploiement : chaque membre n'y est déployé
+            # qu'une fois, ses autres occurrences deviennent des ref<>.
+            if local in expanded:
+                return Expr("ref", local)
+            expanded.add(local)
+            return (yield self._resolve_type_name(type_name, state, context_name))
+        expr = self._type_memo.get(key)
+        if expr is not None:
+            self.memo_hits += 1
+            return expr
+        if cycle is None:
+            expr = yield self._resolve_type_name(type_name, state, context_name)
+        else:
+            # Point d'entrée du cycle : le résultat ne dépend que de ce type,
+            # pas de l'ordre de compilation, et peut être mémorisé.
+            self._open_cycles[cycle] = {local}
+            try:
+                expr = yield self._resolve_type_name(type_name, state, context_name)
+            finally:
+                del self._open_cycles[cycle]
+        self._type_memo[key] = expr
+        return expr
 
+    def _resolve_type_name(self, type_name: str, state: int, context_name: str) -> _Task[Expr]:
+        if self._type_kind(type_name) == "complex":
+            local = _strip_ns(type_name)
+            return (yield self._expr_for_complex_type(self.complex_types[local], state, context_name=context_name))
+        return self._scalar_for_type_name(type_name)
+
+    def _scalar_for_type_name(self, type_name: str) -> Expr:
+        kind = self._type_kind(type_name)
+        if kind == "builtin":
+            return Expr("scalar", self._builtin_scalar(type_name))
+        if kind == "structured_text":
+            return Expr("scalar", "structured_text")
+        if kind == "simple":
+            return self._expr_for_simple_type(self.simple_types[_strip_ns(type_name)])
         return Expr("scalar", "string")
 
-    def _attribute_to_field(self, attr: ET.Element) -> Field:
+    def _enter_field(self, state: int, name: str) -> int | None:
+        # Les champs ignorés sont écartés avant compilation de leur sous-arbre.
+        state, ignored = self._ignore.step(state, name)
+        if ignored:
+            self.pruned_fields += 1
+            return None
+        return state
+
+    def _attribute_to_field(self, attr: ET.Element, state: int) -> _Task[Field | None]:
         name = _snake_case(attr.get("name", "attribute"))
+        field_state = self._enter_field(state, name)
+        if field_state is None:
+            return None
         attr_type = attr.get("type")
-        inline_simple = attr.find(f"{XSD_NS}simpleType")
+        inline_simple = self._child(attr, "simpleType")
         if attr_type:
-            expr = self._expr_for_type_name(attr_type, context_name=name)
+            expr = yield self._expr_for_type_name(attr_type, field_state, context_name=name)
         elif inline_simple is not None:
             expr = self._expr_for_simple_type(inline_simple)
         else:
@@ -204,81 +582,141 @@ class XSDSchemaCompiler:
             expr = Expr("optional", expr)
         return expr
 
-    def _expr_for_element_content(self, node: ET.Element) -> Expr:
+    def _expr_for_element_content(self, node: ET.Element, state: int) -> _Task[Expr]:
         element_name = _snake_case(node.get("name", "item"))
         element_type = node.get("type")
         if element_type:
-            return self._expr_for_type_name(element_type, context_name=element_name)
+            return (yield self._expr_for_type_name(element_type, state, context_name=element_name))
 
-        inline_simple = node.find(f"{XSD_NS}simpleType")
+        inline_simple = self._child(node, "simpleType")
         if inline_simple is not None:
             return self._expr_for_simple_type(inline_simple)
 
-        inline_complex = node.find(f"{XSD_NS}complexType")
+        inline_complex = self._child(node, "complexType")
         if inline_complex is not None:
-            return self._expr_for_complex_type(inline_complex, context_name=element_name)
+            return (yield self._expr_for_complex_type(inline_complex, state, context_name=element_name))
 
         return Expr("scalar", "string")
 
-    def _element_to_field(self, node: ET.Element) -> Field:
+    def _element_to_field(self, node: ET.Element, state: int) -> _Task[Field | None]:
         name = _snake_case(node.get("name", "item"))
-        expr = self._expr_for_element_content(node)
+        field_state = self._enter_field(state, name)
+        if field_state is None:
+            return None
+        expr = yield self._expr_for_element_content(node, field_state)
         expr = self._element_occurs_wrapped(expr, node)
         return Field(name, expr)
 
-    def _expr_for_complex_type(self, node: ET.Element, context_name: str = "") -> Expr:
-        complex_content = node.find(f"{XSD_NS}complexContent")
-        if complex_content is not None:
-            extension = complex_content.find(f"{XSD_NS}extension")
-            if extension is not None:
-                base = extension.get("base", "xs:string")
-                base_expr = self._expr_for_type_name(base, context_name=context_name)
-                if base_expr.kind == "scalar":
-                    base_field_name = self._base_value_name(str(base_expr.value), context_name)
-                    fields = [Field(base_field_name, base_expr)]
-                else:
-                    fields = [Field("value", base_expr)]
-                for attr in extension.findall(f"{XSD_NS}attribute"):
-                    fields.append(self._attribute_to_field(attr))
-                return Expr("object", self._filter_fields(fields))
-
-        simple_content = node.find(f"{XSD_NS}simpleContent")
-        if simple_content is not None:
-            extension = simple_content.find(f"{XSD_NS}extension")
+    def _content_extension(self, node: ET.Element) -> ET.Element | None:
+        for content_tag in ("complexContent", "simpleContent"):
+            content = self._child(node, content_tag)
+            if content is None:
+                continue
+            extension = self._child(content, "extension")
             if extension is not None:
-                base = extension.get("base", "xs:string")
-                base_expr = self._expr_for_type_name(base, context_name=context_name)
-                if base_expr.kind == "scalar":
-                    base_field_name = self._base_value_name(str(base_expr.value), context_name)
-                    fields = [Field(base_field_name, base_expr)]
-                else:
-                    fields = [Field("value", base_expr)]
-                for attr in extension.findall(f"{XSD_NS}attribute"):
-                    fields.append(self._attribute_to_field(attr))
-                return Expr("object", self._filter_fields(fields))
+                return extension
+        return None
+
+    def _expr_for_complex_type(self, node: ET.Element, state: int, context_name: str = "") -> _Task[Expr]:
+        extension = self._content_extension(node)
+        if extension is not None:
+            base = extension.get("base", "xs:string")
+            fields = []
+            if self._type_kind(base) == "complex":
+                base_state = self._enter_field(state, "value")
+                if base_state is not None:
+                    base_expr = yield self._expr_for_type_name(base, base_state, context_name=context_name)
+                    fields.append(Field("value", base_expr))
+            else:
+                base_expr = self._scalar_for_type_name(base)
+                base_field_name = self._base_value_name(str(base_expr.value), context_name)
+                if self._enter_field(state, base_field_name) is not None:
+                    fields.append(Field(base_field_name, base_expr))
+            for attr in self._children(extension, "attribute"):
+                field = yield self._attribute_to_field(attr, state)
+                if field is not None:
+                    fields.append(field)
+            return Expr("object", fields)
 
         fields: list[Field] = []
-        sequence = node.find(f"{XSD_NS}sequence")
+        sequence = self._child(node, "sequence")
         if sequence is not None:
-            elements = sequence.findall(f"{XSD_NS}element")
-            if len(elements) == 1 and not node.findall(f"{XSD_NS}attribute"):
+            elements = self._children(sequence, "element")
+            if len(elements) == 1 and not self._children(node, "attribute"):
                 child = elements[0]
                 child_min = child.get("minOccurs", "1")
                 child_max = child.get("maxOccurs", "1")
                 if child_min == "1" and child_max != "1":
-                    child_expr = self._expr_for_element_content(child)
+                    child_expr = yield self._expr_for_element_content(child, state)
                     return Expr("list", child_expr)
 
             for element in elements:
-                fields.append(self._element_to_field(element))
-
-        for attr in node.findall(f"{XSD_NS}attribute"):
-            fields.append(self._attribute_to_field(attr))
-
-        return Expr("object", self._filter_fields(fields))
+                field = yield self._element_to_field(element, state)
+                if field is not None:
+                    fields.append(field)
+
+        for attr in self._children(node, "attribute"):
+            field = yield self._attribute_to_field(attr, state)
+            if field is not None:
+                fields.append(field)
+
+        return Expr("object", fields)
+
+    def _drive(self, task: _Task[_T]) -> _T:
+        # Les routines de compilation sont des générateurs qui cèdent leurs
+        # sous-tâches au lieu de s'appeler : la pile explicite ci-dessous
+        # remplace la pile d'appels Python, quelle que soit la profondeur.
+        stack = [task]
+        result: Any = None
+        error: BaseException | None = None
+        while stack:
+            try:
+                if error is None:
+                    sub = stack[-1].send(result)
+                else:
+                    sub = stack[-1].throw(error)
+                    error = None
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+            except BaseException as exc:
+                stack.pop()
+                if not stack:
+                    raise
+                error = exc
+                continue
+            stack.append(sub)
+            result = None
+            if len(stack) > self.peak_stack_depth:
+                self.peak_stack_depth = len(stack)
+        return result
+
+    def index_stats(self) -> dict[str, int]:
+        return {
+            "schema_bytes": self.schema_path.stat().st_size,
+            "simple_types": len(self.simple_types),
+            "complex_types": len(self.complex_types),
+            "global_elements": len(self.global_elements),
+            "indexed_nodes": len(self._shapes),
+        }
 
-    def _filter_fields(self, fields: list[Field]) -> list[Field]:
-        return [f for f in fields if f.name not in self.ignored_keys]
+    def set_ignored_keys(self, ignored_keys: Iterable[str]) -> None:
+        """Remplace les règles d'ignorance sans recharger le schéma.
+
+        Le mémo de types dépend des règles ; celui des derniers jeux de règles
+        utilisés est conservé, si bien que revenir à un jeu déjà compilé
+        réutilise ses types.
+        """
+        rules = frozenset(ignored_keys)
+        current = frozenset(self.ignored_keys)
+        if rules == current:
+            return
+        self._warm_memos[current] = (self._ignore, self._type_memo)
+        while len(self._warm_memos) > _MAX_WARM_MEMOS:
+            del self._warm_memos[next(iter(self._warm_memos))]
+        self._ignore, self._type_memo = self._warm_memos.pop(rules, None) or (_IgnoreMatcher(rules), {})
+        self.ignored_keys = set(rules)
 
     def compile_root(self, root_identifier: str) -> tuple[str, Expr]:
         aliases = {
@@ -292,106 +730,373 @@ class XSDSchemaCompiler:
         if root_identifier in aliases:
             lookup = aliases[root_identifier]
 
+        name = root_output_name(root_identifier)
+        state, _ = self._ignore.step(self._ignore.start, name)
+
         if lookup in self.global_elements:
             root_element = self.global_elements[lookup]
-            expr = self._expr_for_element_content(root_element)
-            name = _snake_case(root_identifier)
+            expr = self._drive(self._expr_for_element_content(root_element, state))
             return name, expr
 
         if lookup in self.complex_types:
-            expr = self._expr_for_complex_type(self.complex_types[lookup], context_name=lookup)
-            name = _snake_case(root_identifier)
+            if self._type_kind(lookup) == "complex":
+                expr = self._drive(self._expr_for_type_name(lookup, state, context_name=lookup))
+            else:
+                expr = self._drive(self._expr_for_complex_type(self.complex_types[lookup], state, context_name=lookup))
             return name, expr
 
         raise ValueError(f"Root '{root_identifier}' introuvable dans le schéma: {self.schema_path}")
 
-    def _render_expr(self, expr: Expr, indent: int) -> list[str]:
-        pad = "  " * indent
-        if expr.kind == "scalar":
-            return [pad + str(expr.value)]
-
+    def compile_roots(self, root_identifiers: Iterable[str]) -> list[tuple[str, Expr]]:
+        return [self.compile_root(root_identifier) for root_identifier in root_identifiers]
+
+    @classmethod
+    def iter_render_nodes(cls, root_name: str, expr: Expr) -> Iterator[tuple[int, str, bool]]:
+        # Produit (profondeur, texte, fermante) pour chaque ligne, sans
+        # indentation, afin que toutes les sorties partagent un seul parcours ;
+        # « fermante » signale les lignes ">" qui referment un list< ou un
+        # optional<. La pile explicite est dépilée dans l'ordre d'affichage :
+        # ("line", indent, texte), ("field", Field, indent) ou
+        # ("expr", Expr, indent, préfixe), le préfixe ("nom: ") précédant le
+        # texte de la première ligne.
+        stack: list[tuple] = []
         if expr.kind == "object":
-            lines: list[str] = []
-            for field in expr.value:  # type: ignore[union-attr]
-                lines.extend(self._render_field(field, indent))
-            return lines or [pad + "{}"]
-
-        if expr.kind == "list":
-            inner: Expr = expr.value  # type: ignore[assignment]
-            if inner.kind == "scalar":
-                return [pad + f"list<{inner.value}>"]
-            lines = [pad + "list<"]
-            lines.extend(self._render_expr(inner, indent + 1))
-            lines.append(pad + ">")
-            return lines
-
-        if expr.kind == "optional":
-            inner = expr.value  # type: ignore[assignment]
-            if inner.kind == "scalar":
-                return [pad + f"optional<{inner.value}>"]
-            lines = [pad + "optional<"]
-            lines.extend(self._render_expr(inner, indent + 1))
-            lines.append(pad + ">")
-            return lines
-
-        return [pad + "string"]
-
-    def _render_field(self, field: Field, indent: int) -> list[str]:
-        pad = "  " * indent
-        expr = field.expr
-        if expr.kind == "object":
-            lines = [pad + f"{field.name}:"]
-            lines.extend(self._render_expr(expr, indent + 1))
-            return lines
-
-        rendered = self._render_expr(expr, indent)
-        first = rendered[0][len(pad):] if rendered else "string"
-        lines = [pad + f"{field.name}: {first}"]
-        if len(rendered) > 1:
-            lines.extend(rendered[1:])
-        return lines
-
-    def render(self, root_name: str, expr: Expr) -> str:
-        if expr.kind == "object":
-            lines = [f"{root_name}:"]
-            lines.extend(self._render_expr(expr, 1))
-            return "\n".join(lines) + "\n"
+            yield 0, f"{root_name}:", False
+            stack.append(("expr", expr, 1, ""))
+        else:
+            stack.append(("expr", expr, 0, f"{root_name}: "))
 
-        rendered = self._render_expr(expr, 0)
-        first = rendered[0] if rendered else "string"
-        lines = [f"{root_name}: {first}"]
-        lines.extend(rendered[1:])
-        return "\n".join(lines) + "\n"
+        while stack:
+            item = stack.pop()
+            if item[0] == "line":
+                yield item[1], item[2], True
+                continue
 
+            if item[0] == "field":
+                _, field, indent = item
+                if field.expr.kind == "object":
+                    yield indent, f"{field.name}:", False
+                    stack.append(("expr", field.expr, indent + 1, ""))
+                else:
+                    stack.append(("expr", field.expr, indent, f"{field.name}: "))
+                continue
 
-def parse(input_path: str, output_dir: str, root: str, ignored_keys_path=None):
+            _, node, indent, prefix = item
+            leaf = _leaf_text(node)
+            if leaf is not None:
+                yield indent, prefix + leaf, False
+            elif node.kind == "object":
+                fields = node.value
+                if not fields:
+                    yield indent, prefix + "{}", False
+                for field in reversed(fields):  # type: ignore[arg-type]
+                    stack.append(("field", field, indent))
+            elif node.kind in {"list", "optional"}:
+                inner: Expr = node.value  # type: ignore[assignment]
+                inner_leaf = _leaf_text(inner)
+                if inner_leaf is not None:
+                    yield indent, prefix + f"{node.kind}<{inner_leaf}>", False
+                else:
+                    yield indent, prefix + f"{node.kind}<", False
+                    stack.append(("line", indent, ">"))
+                    stack.append(("expr", inner, indent + 1, ""))
+            else:
+                yield indent, prefix + "string", False
+
+    @classmethod
+    def iter_render(cls, root_name: str, expr: Expr) -> Iterator[str]:
+        for depth, text, _ in cls.iter_render_nodes(root_name, expr):
+            yield "  " * depth + text
+
+    @classmethod
+    def render(cls, root_name: str, expr: Expr) -> str:
+        return "".join(line + "\n" for line in cls.iter_render(root_name, expr))
+
+    @classmethod
+    def render_to(cls, handle: TextIO, root_name: str, expr: Expr) -> None:
+        write = handle.write
+        for line in cls.iter_render(root_name, expr):
+            write(line)
+            write("\n")
+
+
+def _expr_children(expr: Expr) -> list[Expr]:
+    if expr.kind == "object":
+        return [f.expr for f in expr.value]  # type: ignore[union-attr]
+    if expr.kind in {"list", "optional"}:
+        return [expr.value]  # type: ignore[list-item]
+    return []
+
+
+def _expr_node_count(expr: Expr) -> int:
+    # Nœuds distincts : les types partagés du DAG ne comptent qu'une fois.
+    seen = {id(expr)}
+    stack = [expr]
+    while stack:
+        for child in _expr_children(stack.pop()):
+            if id(child) not in seen:
+                seen.add(id(child))
+                stack.append(child)
+    return len(seen)
+
+
+def _expr_to_data(expr: Expr) -> list[tuple]:
+    # Table plate en ordre postfixe : chaque nœud désigne ses enfants par leur
+    # indice, si bien que l'imbrication reste bornée (marshal refuse les
+    # structures trop profondes) et que les sous-arbres partagés (mémo de
+    # types) ne sont encodés qu'une fois. La racine est la dernière entrée.
+    table: list[tuple] = []
+    index: dict[int, int] = {}
+    stack: list[tuple[Expr, bool]] = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in index:
+            continue
+        children = _expr_children(node)
+        if children and not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+            continue
+        if node.kind == "object":
+            fields = node.value  # type: ignore[assignment]
+            table.append(("object", tuple((f.name, index[id(f.expr)]) for f in fields)))
+        elif node.kind in {"list", "optional"}:
+            table.append((node.kind, index[id(node.value)]))
+        else:
+            table.append((node.kind, node.value))
+        index[id(node)] = len(table) - 1
+    return table
+
+
+def _expr_from_data(table: list[tuple]) -> Expr:
+    # Les enfants précèdent toujours leur parent dans la table.
+    nodes: list[Expr] = []
+    for kind, value in table:
+        if kind == "object":
+            nodes.append(Expr("object", [Field(name, nodes[sub]) for name, sub in value]))
+        elif kind in {"list", "optional"}:
+            nodes.append(Expr(kind, nodes[value]))
+        else:
+            nodes.append(Expr(kind, value))
+    return nodes[-1]
+
+
+class CompileCache:
+    """Cache disque des arbres Expr compilés.
+
+    La clé combine le SHA-256 du schéma, la racine demandée, l'ensemble
+    normalisé des clés ignorées et l'empreinte de ce module (toute évolution du
+    compilateur invalide donc les entrées existantes).
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._schema_digests: dict[tuple[str, int, int], bytes] = {}
+
+    def _schema_digest(self, schema_path: str | Path) -> bytes:
+        stat = os.stat(schema_path)
+        stamp = (str(schema_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._schema_digests.get(stamp)
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(schema_path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 16), b""):
+                    hasher.update(chunk)
+            digest = self._schema_digests[stamp] = hasher.digest()
+        return digest
+
+    def key(self, schema_path: str | Path, root: str, ignored_keys: Iterable[str]) -> str:
+        digest = hashlib.sha256(self._schema_digest(schema_path))
+        digest.update(b"\0" + root.encode("utf-8"))
+        digest.update(b"\0" + "\n".join(sorted(set(ignored_keys))).encode("utf-8"))
+        digest.update(b"\0" + hashlib.sha256(Path(__file__).read_bytes()).digest())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> tuple[str, Expr] | None:
+        path = self.cache_dir / f"{key}.bin"
+        try:
+            payload = path.read_bytes()
+            root_name, data = marshal.loads(payload)
+            expr = _expr_from_data(data)
+        except (OSError, EOFError, ValueError, TypeError, IndexError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_read += len(payload)
+        return root_name, expr
+
+    def store(self, key: str, root_name: str, expr: Expr) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        payload = marshal.dumps((root_name, _expr_to_data(expr)))
+        path = self.cache_dir / f"{key}.bin"
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+        self.bytes_written += len(payload)
+
+    def merge_stats(self, other: CompileCache) -> None:
+        self.hits += other.hits
+        self.misses += other.misses
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+
+    def summary(self) -> str:
+        return (
+            f"cache: hit={self.hits} miss={self.misses} "
+            f"read={self.bytes_read}B written={self.bytes_written}B"
+        )
+
+
+class CompilerPool:
+    """Compilateurs gardés en mémoire d'un appel de compile_many à l'autre.
+
+    Un compilateur est réutilisé, index du schéma et mémo de types compris,
+    tant que son fichier garde la même taille et la même date ; seules ses
+    règles d'ignorance sont alors remplacées.
+    """
+
+    def __init__(self) -> None:
+        self._compilers: dict[Path, tuple[tuple[int, int], XSDSchemaCompiler]] = {}
+
+    def get(self, schema_path: str | Path, ignored_keys: Iterable[str]) -> XSDSchemaCompiler:
+        path = Path(schema_path).resolve()
+        stat = path.stat()
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        entry = self._compilers.get(path)
+        if entry is None or entry[0] != stamp:
+            compiler = XSDSchemaCompiler(str(path), ignored_keys=ignored_keys)
+            self._compilers[path] = (stamp, compiler)
+            return compiler
+        compiler = entry[1]
+        compiler.set_ignored_keys(ignored_keys)
+        return compiler
+
+
+def compile_many(
+    input_path: str,
+    roots: Iterable[str],
+    ignored_keys_path=None,
+    cache: CompileCache | None = None,
+    pool: CompilerPool | None = None,
+    profiler: StageProfiler = NO_PROFILE,
+) -> list[tuple[str, Expr]]:
+    """Compile plusieurs racines contre un seul chargement du schéma.
+
+    Le schéma n'est chargé que si au moins une racine manque dans le cache ;
+    toutes les racines partagent alors le même index et le même mémo de types.
+    Avec pool, ce chargement est lui-même réutilisé d'un appel à l'autre.
+    profiler reçoit les étapes cache, load (lecture et indexation) et compile.
+    """
     ignored_keys = _read_ignored_keys(ignored_keys_path)
-    compiler = XSDSchemaCompiler(input_path, ignored_keys=ignored_keys)
-    root_name, expr = compiler.compile_root(root)
-    rendered = compiler.render(root_name, expr)
-
+    compiler: XSDSchemaCompiler | None = None
+    compiled: list[tuple[str, Expr]] = []
+    for root in roots:
+        cached = None
+        if cache is not None:
+            with profiler.stage("cache", root=root) as record:
+                cache_key = cache.key(input_path, root, ignored_keys)
+                cached = cache.load(cache_key)
+                record["hit"] = cached is not None
+        if cached is None:
+            if compiler is None:
+                with profiler.stage("load", schema=str(input_path)) as record:
+                    if pool is not None:
+                        compiler = pool.get(input_path, ignored_keys)
+                    else:
+                        compiler = XSDSchemaCompiler(input_path, ignored_keys=ignored_keys)
+                    record.update(compiler.index_stats())
+            with profiler.stage("compile", root=root) as record:
+                memo_hits, pruned_fields = compiler.memo_hits, compiler.pruned_fields
+                cached = compiler.compile_root(root)
+                if profiler.enabled:
+                    record.update(
+                        nodes=_expr_node_count(cached[1]),
+                        memo_hits=compiler.memo_hits - memo_hits,
+                        pruned_fields=compiler.pruned_fields - pruned_fields,
+                        peak_stack_depth=compiler.peak_stack_depth,
+                    )
+            if cache is not None:
+                cache.store(cache_key, *cached)
+        compiled.append(cached)
+    return compiled
+
+
+def parse_many(
+    input_path: str,
+    output_dir: str,
+    roots: Iterable[str],
+    ignored_keys_path=None,
+    cache: CompileCache | None = None,
+    profiler: StageProfiler = NO_PROFILE,
+) -> list[str]:
     out_dir = Path(output_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-    output_file = out_dir / f"{root_name}.schema.txt"
-    output_file.write_text(rendered, encoding="utf-8")
-    return str(output_file)
+    outputs: list[str] = []
+    compiled = compile_many(input_path, roots, ignored_keys_path=ignored_keys_path, cache=cache, profiler=profiler)
+    for root_name, expr in compiled:
+        output_file = out_dir / f"{root_name}.schema.txt"
+        with profiler.stage("render", root=root_name) as record:
+            with output_file.open("w", encoding="utf-8") as handle:
+                XSDSchemaCompiler.render_to(handle, root_name, expr)
+            record["output_bytes"] = output_file.stat().st_size
+        outputs.append(str(output_file))
+    return outputs
+
+
+def parse(
+    input_path: str,
+    output_dir: str,
+    root: str,
+    ignored_keys_path=None,
+    cache: CompileCache | None = None,
+):
+    return parse_many(input_path, output_dir, [root], ignored_keys_path=ignored_keys_path, cache=cache)[0]
 
 
 def main() -> None:
     cli = argparse.ArgumentParser(description="Compile un schéma XSD en pseudo-langage.")
     cli.add_argument("--schema", required=True, help="Chemin du fichier XSD")
-    cli.add_argument("--root", required=True, help="Nom logique du type racine (ex: attack_pattern)")
+    cli.add_argument(
+        "--root",
+        required=True,
+        action="append",
+        help="Nom logique du type racine (ex: attack_pattern) ; répétable",
+    )
     cli.add_argument("--output-dir", default=".", help="Répertoire de sortie")
     cli.add_argument("--ignored-keys", default=None, help="Fichier de clés à ignorer")
+    cli.add_argument("--cache-dir", default=None, help="Répertoire du cache de compilation (désactivé par défaut)")
+    cli.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="JSON",
+        help="Écrit un rapport JSON des étapes (durée, CPU, pic mémoire) ; sans chemin, sur la sortie d'erreur",
+    )
 
     args = cli.parse_args()
-    out = parse(
-        input_path=args.schema,
-        output_dir=args.output_dir,
-        root=args.root,
-        ignored_keys_path=args.ignored_keys,
-    )
-    print(out)
+    cache = CompileCache(args.cache_dir) if args.cache_dir else None
+    profiler = StageProfiler(enabled=args.profile is not None).start()
+    with profiler.stage("total"):
+        outputs = parse_many(
+            input_path=args.schema,
+            output_dir=args.output_dir,
+            roots=args.root,
+            ignored_keys_path=args.ignored_keys,
+            cache=cache,
+            profiler=profiler,
+        )
+    if args.profile is not None:
+        write_report(profiler.report(command="parser", schema=args.schema, roots=args.root), args.profile)
+    profiler.stop()
+    for out in outputs:
+        print(out)
+    if cache is not None:
+        print(cache.summary(), file=sys.stderr)
 
 
 if __name__ == "__main__":
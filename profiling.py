@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Iterator
+
+
+class StageProfiler:
+    """Mesures par étape : durée, temps CPU, pic mémoire et compteurs libres.
+
+    Chaque stage() ajoute un enregistrement à stages ; le bloc mesuré y
+    inscrit ses propres compteurs (nœuds, octets écrits...). Le pic mémoire
+    vient de tracemalloc, démarré par start() ; les étapes imbriquées restent
+    justes car le pic d'une étape englobante tient compte de ses sous-étapes.
+    Un profileur désactivé ne mesure rien et ne garde aucun enregistrement.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: list[dict[str, Any]] = []
+        self._peaks: list[int] = []
+        self._owns_tracing = False
+
+    def start(self) -> StageProfiler:
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        return self
+
+    def stop(self) -> None:
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    @contextmanager
+    def stage(self, name: str, **labels: Any) -> Iterator[dict[str, Any]]:
+        record: dict[str, Any] = {"stage": name, **labels}
+        if not self.enabled:
+            yield record
+            return
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+            start_memory = current
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = round(time.perf_counter() - wall, 6)
+            record["cpu_s"] = round(time.process_time() - cpu, 6)
+            if tracing:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_alloc_bytes"] = peak - start_memory
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+            self.stages.append(record)
+
+    def report(self, **extra: Any) -> dict[str, Any]:
+        return {
+            "python": platform.python_version(),
+            "tracemalloc": tracemalloc.is_tracing(),
+            **extra,
+            "stages": self.stages,
+        }
+
+
+def write_report(report: dict[str, Any], destination: str | None) -> None:
+    """Écrit le rapport JSON dans destination, ou sur la sortie d'erreur si "-"."""
+    text = json.dumps(report, indent=2, ensure_ascii=False) + "\n"
+    if destination in (None, "-"):
+        sys.stderr.write(text)
+        return
+    path = Path(destination)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+NO_PROFILE = StageProfiler(enabled=False)
@@ -0,0 +1,535 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+import json
+import re
+from pathlib import Path
+from typing import Callable, Iterable, TextIO
+from xml.sax.saxutils import escape
+
+from parser import Expr, XSDSchemaCompiler
+
+
+_FIELD_LABEL = re.compile(r"[\w.-]+:")
+_MIN_PART_FIELDS = 2
+
+
+class Sink:
+    """Sortie alimentée au fil du parcours de l'arbre compilé.
+
+    Chaque ligne du pseudo-schéma arrive sous forme (profondeur, texte) ; les
+    lignes ">" qui referment un list< ou un optional< passent par closer(),
+    que les sorties arborescentes ignorent.
+    """
+
+    suffix = ""
+
+    def __init__(self, handle: TextIO):
+        self.handle = handle
+
+    def begin(self, title: str | None) -> None:
+        pass
+
+    def node(self, depth: int, text: str) -> None:
+        raise NotImplementedError
+
+    def closer(self, depth: int, text: str) -> None:
+        self.node(depth, text)
+
+    def end(self) -> None:
+        pass
+
+
+class TextSink(Sink):
+    suffix = ".schema.txt"
+
+    def node(self, depth: int, text: str) -> None:
+        self.handle.write("  " * depth + text + "\n")
+
+
+class PumlSink(Sink):
+    suffix = ".puml"
+
+    def begin(self, title: str | None) -> None:
+        self.handle.write("@startmindmap\n")
+        if title:
+            self.handle.write(f"title {title}\n")
+
+    def node(self, depth: int, text: str) -> None:
+        self.handle.write("*" * (depth + 1) + " " + text + "\n")
+
+    def end(self) -> None:
+        self.handle.write("@endmindmap\n")
+
+
+def split_mindmap(
+    nodes: list[tuple[int, str, bool]],
+    max_depth: int | None = None,
+    max_nodes: int | None = None,
+) -> list[list[tuple[int, str, int | None]]]:
+    """Découpe les lignes (profondeur, texte, fermante) d'une mindmap en parties.
+
+    La partie 0 est la vue d'ensemble. Seuls les champs (« nom: ... ») dont la
+    branche contient au moins _MIN_PART_FIELDS autres champs sont coupés,
+    jamais les list< et optional< qu'ils enveloppent. Une telle branche part dans sa propre
+    sous-mindmap lorsqu'elle atteint max_depth niveaux sous la racine de sa
+    partie, ou lorsqu'elle est la plus grande branche tenant dans max_nodes
+    nœuds. Chaque partie est une liste (profondeur relative, texte, partie
+    référencée ou None) ; le nœud coupé reste dans sa partie d'origine comme
+    renvoi vers la nouvelle.
+    """
+    parents: list[int | None] = []
+    openers: dict[int, int] = {}
+    stack: list[int] = []
+    for index, (depth, _, closing) in enumerate(nodes):
+        popped = None
+        while stack and nodes[stack[-1]][0] >= depth:
+            popped = stack.pop()
+        if closing and popped is not None and nodes[popped][0] == depth:
+            openers[index] = popped
+        parents.append(stack[-1] if stack else None)
+        stack.append(index)
+
+    is_field = [not closing and _FIELD_LABEL.match(text) is not None for _, text, closing in nodes]
+    sizes = [1] * len(nodes)
+    nested_fields = [0] * len(nodes)
+    for index in range(len(nodes) - 1, -1, -1):
+        parent = parents[index]
+        if parent is not None:
+            sizes[parent] += sizes[index]
+            nested_fields[parent] += nested_fields[index] + is_field[index]
+
+    # Le budget se compare à la taille du champ englobant le plus proche :
+    # un list< ou un optional< n'étant jamais coupé, ses champs le sont à sa place.
+    anchors: list[int | None] = []
+    for index, parent in enumerate(parents):
+        anchors.append(parent if parent is None or is_field[parent] else anchors[parent])
+
+    parts: list[list[tuple[int, str, int | None]]] = [[]]
+    bases = [0]
+    owner = [0] * len(nodes)
+    for index, (depth, text, closing) in enumerate(nodes):
+        parent = parents[index]
+        part = owner[parent] if parent is not None else 0
+        owner[index] = part
+        opener = openers.get(index)
+        if opener is not None and owner[opener] != part:
+            # Le ">" d'une branche coupée disparaît avec elle.
+            continue
+        relative = depth - bases[part]
+        anchor = anchors[index]
+        cut = anchor is not None and is_field[index] and nested_fields[index] >= _MIN_PART_FIELDS and (
+            (max_depth is not None and relative >= max_depth)
+            or (max_nodes is not None and sizes[index] <= max_nodes < sizes[anchor])
+        )
+        if cut:
+            owner[index] = len(parts)
+            parts[part].append((relative, text, len(parts)))
+            parts.append([(0, text, None)])
+            bases.append(depth)
+        else:
+            parts[part].append((relative, text, None))
+    return parts
+
+
+class SplitPumlSink(Sink):
+    """Mindmap PlantUML découpée en une vue d'ensemble et des sous-mindmaps.
+
+    La vue d'ensemble est écrite dans handle, chaque branche coupée dans
+    part_path(n) (n à partir de 1) ; les chemins écrits sont dans parts.
+    """
+
+    suffix = ".puml"
+
+    def __init__(
+        self,
+        handle: TextIO,
+        part_path: Callable[[int], Path],
+        max_depth: int | None = None,
+        max_nodes: int | None = None,
+    ):
+        super().__init__(handle)
+        self.part_path = part_path
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.parts: list[Path] = []
+        self._title: str | None = None
+        self._nodes: list[tuple[int, str, bool]] = []
+
+    def begin(self, title: str | None) -> None:
+        self._title = title
+
+    def node(self, depth: int, text: str) -> None:
+        self._nodes.append((depth, text, False))
+
+    def closer(self, depth: int, text: str) -> None:
+        self._nodes.append((depth, text, True))
+
+    def end(self) -> None:
+        parts = split_mindmap(self._nodes, self.max_depth, self.max_nodes)
+        self._nodes = []
+        self.parts = [self.part_path(number) for number in range(1, len(parts))]
+        self._write(self.handle, self._title, parts[0])
+        for number, path in enumerate(self.parts, start=1):
+            label = parts[number][0][1].split(":", 1)[0]
+            title = f"{self._title} - {label}" if self._title else label
+            with path.open("w", encoding="utf-8") as handle:
+                self._write(handle, title, parts[number])
+
+    def _write(self, handle: TextIO, title: str | None, lines: list[tuple[int, str, int | None]]) -> None:
+        handle.write("@startmindmap\n")
+        if title:
+            handle.write(f"title {title}\n")
+        for depth, text, ref in lines:
+            if ref is None:
+                handle.write("*" * (depth + 1) + " " + text + "\n")
+            else:
+                # Lien PlantUML vers le PDF de la sous-mindmap, rendu à côté de celui-ci.
+                stem = self.part_path(ref).stem
+                handle.write("*" * (depth + 1) + f"[#lightblue] {text} [[{stem}.pdf {stem}]]\n")
+        handle.write("@endmindmap\n")
+
+
+class JsonSink(Sink):
+    """Arbre {"label", "children"} écrit au fil de l'eau, sans le construire."""
+
+    suffix = ".json"
+
+    def __init__(self, handle: TextIO):
+        super().__init__(handle)
+        self._open: list[int] = []
+        self._first = True
+
+    def begin(self, title: str | None) -> None:
+        self.handle.write('{"title": ' + json.dumps(title) + ', "nodes": [')
+
+    def node(self, depth: int, text: str) -> None:
+        self._close_to(depth)
+        if not self._first:
+            self.handle.write(", ")
+        self.handle.write('{"label": ' + json.dumps(text, ensure_ascii=False) + ', "children": [')
+        self._open.append(depth)
+        self._first = True
+
+    def closer(self, depth: int, text: str) -> None:
+        pass
+
+    def _close_to(self, depth: int) -> None:
+        while self._open and self._open[-1] >= depth:
+            self._open.pop()
+            self.handle.write("]}")
+            self._first = False
+
+    def end(self) -> None:
+        self._close_to(-1)
+        self.handle.write("]}\n")
+
+
+class _GraphSink(Sink):
+    """Base des sorties qui nomment chaque nœud et le relient à son parent."""
+
+    def __init__(self, handle: TextIO):
+        super().__init__(handle)
+        self._parents: list[tuple[int, str]] = []
+        self._count = 0
+
+    def closer(self, depth: int, text: str) -> None:
+        pass
+
+    def node(self, depth: int, text: str) -> None:
+        while self._parents and self._parents[-1][0] >= depth:
+            self._parents.pop()
+        node_id = f"n{self._count}"
+        self._count += 1
+        self.emit(node_id, self._parents[-1][1] if self._parents else None, len(self._parents), text)
+        self._parents.append((depth, node_id))
+
+    def emit(self, node_id: str, parent_id: str | None, level: int, text: str) -> None:
+        raise NotImplementedError
+
+
+class MermaidSink(_GraphSink):
+    suffix = ".mmd"
+
+    def begin(self, title: str | None) -> None:
+        if title:
+            self.handle.write(f"---\ntitle: {json.dumps(title, ensure_ascii=False)}\n---\n")
+        self.handle.write("mindmap\n")
+
+    def emit(self, node_id: str, parent_id: str | None, level: int, text: str) -> None:
+        label = text.replace('"', "#quot;")
+        self.handle.write("  " * (level + 1) + f'{node_id}["{label}"]\n')
+
+
+class DotSink(_GraphSink):
+    suffix = ".dot"
+
+    def begin(self, title: str | None) -> None:
+        self.handle.write("digraph mindmap {\n  rankdir=LR;\n  node [shape=box, fontname=monospace];\n")
+        if title:
+            self.handle.write(f"  label={json.dumps(title, ensure_ascii=False)};\n  labelloc=t;\n")
+
+    def emit(self, node_id: str, parent_id: str | None, level: int, text: str) -> None:
+        self.handle.write(f"  {node_id} [label={json.dumps(text, ensure_ascii=False)}];\n")
+        if parent_id is not None:
+            self.handle.write(f"  {parent_id} -> {node_id};\n")
+
+    def end(self) -> None:
+        self.handle.write("}\n")
+
+
+def tidy_tree_layout(children: list[list[int]], distance: float) -> list[float]:
+    """Position transversale de chaque nœud d'un arbre enraciné en 0.
+
+    Algorithme de Walker en temps linéaire (Buchheim, Jünger, Leipert) :
+    sous-arbres aussi rapprochés que leurs contours le permettent, parents
+    centrés sur leurs enfants, frères espacés d'au moins distance. Les deux
+    parcours sont itératifs, l'arbre pouvant compter des milliers de niveaux.
+    """
+    count = len(children)
+    parent = [-1] * count
+    number = [0] * count
+    for node, kids in enumerate(children):
+        for index, kid in enumerate(kids):
+            parent[kid] = node
+            number[kid] = index
+    prelim = [0.0] * count
+    mod = [0.0] * count
+    shift = [0.0] * count
+    change = [0.0] * count
+    thread = [-1] * count
+    ancestor = list(range(count))
+
+    def next_left(node: int) -> int:
+        return children[node][0] if children[node] else thread[node]
+
+    def next_right(node: int) -> int:
+        return children[node][-1] if children[node] else thread[node]
+
+    def move_subtree(left: int, right: int, amount: float) -> None:
+        subtrees = number[right] - number[left]
+        change[right] -= amount / subtrees
+        shift[right] += amount
+        change[left] += amount / subtrees
+        prelim[right] += amount
+        mod[right] += amount
+
+    def apportion(node: int, default_ancestor: int) -> int:
+        if number[node] == 0:
+            return default_ancestor
+        siblings = children[parent[node]]
+        inner_right = outer_right = node
+        inner_left = siblings[number[node] - 1]
+        outer_left = siblings[0]
+        sum_ir = sum_or = mod[node]
+        sum_il = mod[inner_left]
+        sum_ol = mod[outer_left]
+        while next_right(inner_left) >= 0 and next_left(inner_right) >= 0:
+            inner_left = next_right(inner_left)
+            inner_right = next_left(inner_right)
+            outer_left = next_left(outer_left)
+            outer_right = next_right(outer_right)
+            ancestor[outer_right] = node
+            gap = prelim[inner_left] + sum_il - prelim[inner_right] - sum_ir + distance
+            if gap > 0:
+                left = ancestor[inner_left] if parent[ancestor[inner_left]] == parent[node] else default_ancestor
+                move_subtree(left, node, gap)
+                sum_ir += gap
+                sum_or += gap
+            sum_il += mod[inner_left]
+            sum_ir += mod[inner_right]
+            sum_ol += mod[outer_left]
+            sum_or += mod[outer_right]
+        if next_right(inner_left) >= 0 and next_right(outer_right) < 0:
+            thread[outer_right] = next_right(inner_left)
+            mod[outer_right] += sum_il - sum_or
+        if next_left(inner_right) >= 0 and next_left(outer_left) < 0:
+            thread[outer_left] = next_left(inner_right)
+            mod[outer_left] += sum_ir - sum_ol
+            default_ancestor = node
+        return default_ancestor
+
+    def finish(node: int) -> None:
+        kids = children[node]
+        left = children[parent[node]][number[node] - 1] if parent[node] >= 0 and number[node] > 0 else -1
+        if kids:
+            total_shift = total_change = 0.0
+            for kid in reversed(kids):
+                prelim[kid] += total_shift
+                mod[kid] += total_shift
+                total_change += change[kid]
+                total_shift += shift[kid] + total_change
+            midpoint = (prelim[kids[0]] + prelim[kids[-1]]) / 2
+            if left >= 0:
+                prelim[node] = prelim[left] + distance
+                mod[node] = prelim[node] - midpoint
+            else:
+                prelim[node] = midpoint
+        elif left >= 0:
+            prelim[node] = prelim[left] + distance
+
+    # Premier parcours, postfixe : pile de [nœud, prochain enfant, ancêtre par défaut].
+    stack = [[0, 0, children[0][0] if children[0] else 0]]
+    while stack:
+        frame = stack[-1]
+        kids = children[frame[0]]
+        if frame[1] < len(kids):
+            kid = kids[frame[1]]
+            frame[1] += 1
+            stack.append([kid, 0, children[kid][0] if children[kid] else kid])
+            continue
+        stack.pop()
+        finish(frame[0])
+        if stack:
+            stack[-1][2] = apportion(frame[0], stack[-1][2])
+
+    # Second parcours, préfixe : cumul des modificateurs des ancêtres.
+    position = [0.0] * count
+    pending = [(0, 0.0)]
+    while pending:
+        node, offset = pending.pop()
+        position[node] = prelim[node] + offset
+        for kid in children[node]:
+            pending.append((kid, offset + mod[node]))
+    return position
+
+
+class SvgSink(Sink):
+    """Mindmap SVG calculée en Python, sans JVM.
+
+    Disposition de gauche à droite : une colonne par profondeur, largeur des
+    étiquettes estimée sur une police à chasse fixe, position verticale
+    donnée par tidy_tree_layout.
+    """
+
+    suffix = ".svg"
+    font_size = 12
+    char_width = 7.2
+    box_height = 22
+    padding = 8
+    column_gap = 36
+    row_gap = 6
+    margin = 16
+
+    def __init__(self, handle: TextIO):
+        super().__init__(handle)
+        self._title: str | None = None
+        self._labels: list[str] = [""]
+        self._depths: list[int] = [-1]
+        self._children: list[list[int]] = [[]]
+        self._open: list[int] = [0]
+
+    def begin(self, title: str | None) -> None:
+        self._title = title
+
+    def node(self, depth: int, text: str) -> None:
+        # Le nœud 0 est une racine virtuelle, non dessinée, qui regroupe les
+        # lignes de profondeur 0.
+        while len(self._open) > 1 and self._depths[self._open[-1]] >= depth:
+            self._open.pop()
+        node_id = len(self._labels)
+        self._labels.append(text)
+        self._depths.append(depth)
+        self._children.append([])
+        self._children[self._open[-1]].append(node_id)
+        self._open.append(node_id)
+
+    def closer(self, depth: int, text: str) -> None:
+        pass
+
+    def end(self) -> None:
+        labels, depths = self._labels, self._depths
+        widths = [len(label) * self.char_width + 2 * self.padding for label in labels]
+        columns: list[float] = []
+        for node_id in range(1, len(labels)):
+            while len(columns) <= depths[node_id]:
+                columns.append(0.0)
+            columns[depths[node_id]] = max(columns[depths[node_id]], widths[node_id])
+        lefts = [float(self.margin)]
+        for column in columns:
+            lefts.append(lefts[-1] + column + self.column_gap)
+
+        position = tidy_tree_layout(self._children, self.box_height + self.row_gap)
+        drawn = range(1, len(labels))
+        top = min((position[n] for n in drawn), default=0.0)
+        title_height = self.font_size * 2 if self._title else 0
+        offset = self.margin + title_height - top
+        ys = [y + offset for y in position]
+        width = (lefts[-1] - self.column_gap + self.margin) if columns else 2 * self.margin
+        height = (max((ys[n] for n in drawn), default=offset) + self.box_height + self.margin)
+
+        write = self.handle.write
+        write(
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{width:.0f}" height="{height:.0f}" viewBox="0 0 {width:.0f} {height:.0f}" '
+            f'font-family="monospace" font-size="{self.font_size}">\n'
+        )
+        if self._title:
+            write(f'<text x="{self.margin}" y="{self.margin + self.font_size}" font-weight="bold">'
+                  f"{escape(self._title)}</text>\n")
+        half = self.box_height / 2
+        write('<g fill="none" stroke="#7a8ca3">\n')
+        for node_id in drawn:
+            x_start = lefts[depths[node_id]] + widths[node_id]
+            y_start = ys[node_id] + half
+            for kid in self._children[node_id]:
+                x_end = lefts[depths[kid]]
+                y_end = ys[kid] + half
+                middle = (x_start + x_end) / 2
+                write(f'<path d="M{x_start:.1f},{y_start:.1f} C{middle:.1f},{y_start:.1f} '
+                      f'{middle:.1f},{y_end:.1f} {x_end:.1f},{y_end:.1f}"/>\n')
+        write("</g>\n")
+        for node_id in drawn:
+            x, y = lefts[depths[node_id]], ys[node_id]
+            fill = "#ffd98e" if depths[node_id] == 0 else "#e3ecf7"
+            write(f'<rect x="{x:.1f}" y="{y:.1f}" width="{widths[node_id]:.1f}" height="{self.box_height}" '
+                  f'rx="4" fill="{fill}" stroke="#4a6078"/>')
+            write(f'<text x="{x + self.padding:.1f}" y="{y + half + self.font_size * 0.35:.1f}">'
+                  f"{escape(labels[node_id])}</text>\n")
+        write("</svg>\n")
+
+
+SINKS: dict[str, type[Sink]] = {
+    "txt": TextSink,
+    "puml": PumlSink,
+    "json": JsonSink,
+    "mermaid": MermaidSink,
+    "dot": DotSink,
+    "svg": SvgSink,
+}
+
+
+def render_sinks(root_name: str, expr: Expr, sinks: Iterable[Sink], title: str | None = None) -> None:
+    """Parcourt l'arbre une seule fois et diffuse chaque ligne à toutes les sorties."""
+    sinks = list(sinks)
+    for sink in sinks:
+        sink.begin(title)
+    for depth, text, closing in XSDSchemaCompiler.iter_render_nodes(root_name, expr):
+        for sink in sinks:
+            if closing:
+                sink.closer(depth, text)
+            else:
+                sink.node(depth, text)
+    for sink in sinks:
+        sink.end()
+
+
+def render_files(
+    root_name: str,
+    expr: Expr,
+    outputs: dict[str, Path],
+    title: str | None = None,
+    sink_types: dict[str, Callable[[TextIO], Sink]] | None = None,
+) -> dict[str, Sink]:
+    """Écrit chaque format demandé ({format: chemin}) en un seul parcours.
+
+    sink_types remplace, par format, la classe de SINKS (ex. SplitPumlSink).
+    """
+    factories = {**SINKS, **(sink_types or {})}
+    with ExitStack() as stack:
+        sinks = {
+            fmt: factories[fmt](stack.enter_context(path.open("w", encoding="utf-8")))
+            for fmt, path in outputs.items()
+        }
+        render_sinks(root_name, expr, sinks.values(), title=title)
+    return sinks
@@ -0,0 +1,63 @@
+import itertools
+import time
+
+from parser import XSDSchemaCompiler
+
+
+def _write_schema(path, body):
+    path.write_text(
+        '<?xml version="1.0"?><xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">'
+        + body
+        + "</xs:schema>",
+        encoding="utf-8",
+    )
+    return path
+
+
+def _dense_cycle(path, n):
+    # n complexTypes qui se référencent tous mutuellement : une seule SCC.
+    body = "".join(
+        f'<xs:complexType name="T{i}"><xs:sequence>'
+        + "".join(f'<xs:element name="F{j}" type="T{j}" minOccurs="0"/>' for j in range(n) if j != i)
+        + '<xs:element name="X" type="xs:int"/></xs:sequence></xs:complexType>'
+        for i in range(n)
+    )
+    return _write_schema(path, body)
+
+
+def test_dense_cycle_compiles_in_linear_size(tmp_path):
+    n = 10
+    compiler = XSDSchemaCompiler(str(_dense_cycle(tmp_path / "dense.xsd", n)))
+    start = time.perf_counter()
+    root_name, expr = compiler.compile_root("T0")
+    elapsed = time.perf_counter() - start
+    lines = compiler.render(root_name, expr).splitlines()
+    # Chaque membre est déployé une fois, chaque autre référence est un ref<>.
+    assert len(lines) <= 2 * n * n
+    assert any("ref<T" in line for line in lines)
+    assert elapsed < 1.0
+
+
+def test_cycle_output_does_not_depend_on_root_order(tmp_path):
+    schema = _dense_cycle(tmp_path / "dense.xsd", 4)
+    roots = [f"T{i}" for i in range(4)]
+    expected: dict[str, str] = {}
+    for order in itertools.permutations(roots):
+        compiler = XSDSchemaCompiler(str(schema))
+        for root in order:
+            rendered = compiler.render(*compiler.compile_root(root))
+            assert expected.setdefault(root, rendered) == rendered, order
+
+
+def test_self_reference_becomes_ref(tmp_path):
+    schema = _write_schema(
+        tmp_path / "self.xsd",
+        '<xs:complexType name="Node"><xs:sequence>'
+        '<xs:element name="Child" type="Node" minOccurs="0" maxOccurs="unbounded"/>'
+        '<xs:element name="Label" type="xs:string"/>'
+        "</xs:sequence></xs:complexType>",
+    )
+    compiler = XSDSchemaCompiler(str(schema))
+    assert compiler.render(*compiler.compile_root("Node")) == (
+        "node:\n  child: optional<\n    list<ref<Node>>\n  >\n  label: string\n"
+    )